@@ -0,0 +1,72 @@
+#Startup-time benchmark.
+#Measures headless import time of the main modules and the cost of creating the HUD and control
+#panel fonts through pygame.font.SysFont versus the cached resolver in gui.fonts (cold and warm).
+#Each measurement runs in a fresh interpreter so module and font caches do not leak between runs.
+#
+#    python benchmarks/startup.py [--repeat 5]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["gui.window", "models.atom", "physics.ewald", "physics.scenarios"]
+
+#The five fonts created by HUD.__init__ and ControlPanel.__init__
+FONTS = [("Arial", 14, False), ("Arial", 16, True), ("Arial", 13, True), ("Verdana", 12, False), ("Verdana", 14, True)]
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+FONT_SNIPPET = """
+import time
+import pygame
+pygame.font.init()
+from gui.fonts import load_font
+fonts = {fonts!r}
+started = time.perf_counter()
+for name, size, bold in fonts:
+    {call}
+print(time.perf_counter() - started)
+"""
+
+def run_snippet(code, env=None, repeat=5):
+    #Best-of-N wall time reported by a snippet run in a fresh interpreter, or None on failure.
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        elapsed = float(result.stdout.strip().splitlines()[-1])
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def report(label, seconds):
+    print(f"  {label:<28} {'unavailable' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+
+    print("Headless import time")
+    for module in MODULES:
+        report(module, run_snippet(IMPORT_SNIPPET.format(module=module), repeat=arguments.repeat))
+
+    print("HUD + control panel fonts")
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, SDL_VIDEODRIVER="dummy", PARTISIM_FONT_CACHE=os.path.join(directory, "fonts.json"))
+        sysfont = FONT_SNIPPET.format(fonts=FONTS, call="pygame.font.SysFont(name, size, bold=bold)")
+        cached = FONT_SNIPPET.format(fonts=FONTS, call="load_font(name, size, bold)")
+        report("pygame.font.SysFont", run_snippet(sysfont, env, arguments.repeat))
+        report("load_font (cold cache)", run_snippet(cached, env, 1))
+        report("load_font (warm cache)", run_snippet(cached, env, arguments.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import pygame
 import numpy as np
 from OpenGL.GL import *
+from gui.fonts import load_font
 
 class ControlPanel:
     #control panel for the simulation interface.
@@ -30,8 +31,8 @@ class ControlPanel:
         
         pygame.font.init()
         try:
-            self.font = pygame.font.SysFont('Verdana', 12) 
-            self.title_font = pygame.font.SysFont('Verdana', 14, bold=True)
+            self.font = load_font('Verdana', 12) 
+            self.title_font = load_font('Verdana', 14, bold=True)
         except Exception:
             print("Verdana font not found, using Pygame default.")
             self.font = pygame.font.Font(None, 18) 
@@ -49,6 +50,7 @@ class ControlPanel:
             {'name': 'Simulation State', 'type': 'title'},
             {'name': 'Pause/Resume (SPACE)', 'type': 'button', 'get_text': lambda: "Resume Sim" if self.physics_engine.paused else "Pause Sim", 'action': self.toggle_pause_resume_sim},
             {'name': 'Simulation Speed', 'type': 'slider', 'value': self.physics_engine.time_scale, 'min': 0.1, 'max': 3.0, 'action': self.set_sim_speed},
+            {'name': 'Rewind', 'type': 'slider', 'value': 1.0, 'min': 0.0, 'max': 1.0, 'action': self.scrub_history},
             {'name': 'Reset Simulation (X)', 'type': 'button', 'action': lambda: self.simulator_instance.reset_simulation()},
             {'name': 'Reset Camera (R)', 'type': 'button', 'action': lambda: self.simulator_instance.reset_camera_view()},
             {'name': 'Clear All Atoms', 'type': 'button', 'action': self.clear_all_atoms_panel},
@@ -92,6 +94,16 @@ class ControlPanel:
     def toggle_show_forces(self): self.renderer.show_forces = not self.renderer.show_forces; self.update_control_value('Toggle Forces (F)', self.renderer.show_forces)
     def toggle_pause_resume_sim(self): self.physics_engine.paused = not self.physics_engine.paused
     def set_sim_speed(self, value): self.physics_engine.time_scale = round(value,1); self.update_control_value('Simulation Speed', self.physics_engine.time_scale)
+    def scrub_history(self, value):
+        #Rewind to the retained step at this position along the engine's history (0 = oldest, 1 = newest).
+        self.update_control_value('Rewind', value)
+        history = getattr(self.physics_engine, 'history', None)
+        if history is None or not history.groups: return
+        self.physics_engine.paused = True
+        step, sim_time = history.restore(history.step_at_fraction(value), self.physics_engine.atoms)
+        self.physics_engine.time = sim_time
+        if hasattr(self.physics_engine, 'step_count'): self.physics_engine.step_count = step
+        if self.simulator_instance.selected_atom not in self.physics_engine.atoms: self.simulator_instance.selected_atom = None
     def clear_all_atoms_panel(self): self.physics_engine.atoms.clear(); self.simulator_instance.selected_atom = None
 
 
@@ -180,6 +192,11 @@ class ControlPanel:
         
         self.surface.fill(self.bg_color) 
         
+        #Once recording resumes after a scrub the history's newest step is the present again
+        history = getattr(self.physics_engine, 'history', None)
+        if history is not None and history.cursor is None and not (self.active_control and self.active_control.get('name') == 'Rewind'):
+            self.update_control_value('Rewind', 1.0)
+        
         self.content_height = self._calculate_content_height() #recalculate in case controls change
         self.max_scroll = max(0, self.content_height - self.height)
         self.scroll_offset_y = max(0, min(self.scroll_offset_y, self.max_scroll))
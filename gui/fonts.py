@@ -0,0 +1,63 @@
+import json
+import os
+
+#Resolved system font paths are cached on disk so later runs can skip pygame's font scan
+#(pygame.font.SysFont / match_font enumerate every installed font on first use, which is slow
+#on Linux).  Entries map "name|bold" to [font file path, needs synthetic bold].  Fonts that were
+#not found are not cached, so a font installed later is picked up on the next run.
+_memory_cache = None
+
+def cache_path():
+    #Location of the font cache (PARTISIM_FONT_CACHE overrides the XDG cache directory).
+    override = os.environ.get('PARTISIM_FONT_CACHE')
+    if override:
+        return override
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'partisim', 'fonts.json')
+
+def _load_cache():
+    global _memory_cache
+    if _memory_cache is None:
+        try:
+            with open(cache_path(), 'r') as handle:
+                _memory_cache = json.load(handle)
+        except (OSError, ValueError):
+            _memory_cache = {}
+    return _memory_cache
+
+def _save_cache(cache):
+    path = cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as handle:
+            json.dump(cache, handle, indent=1)
+    except OSError:
+        pass  #a read-only home just means we resolve again next run
+
+def resolve_font_path(name, bold=False):
+    #(path of the system font `name` or None for pygame's default font, whether to embolden it).
+    #Like SysFont, bold is synthesized only when there is no separate bold face for the font.
+    cache = _load_cache()
+    key = f"{name.lower()}|{int(bold)}"
+    entry = cache.get(key)
+    if isinstance(entry, list) and len(entry) == 2 and os.path.exists(entry[0]):
+        return entry[0], bool(entry[1])
+
+    import pygame
+    path = pygame.font.match_font(name, bold=bold)
+    if not path:
+        return None, bold
+    synthetic_bold = bold and path == pygame.font.match_font(name)
+    cache[key] = [path, synthetic_bold]
+    _save_cache(cache)
+    return path, synthetic_bold
+
+def load_font(name, size, bold=False):
+    #Drop-in replacement for pygame.font.SysFont that goes through the resolved-path cache.
+    import pygame
+    pygame.font.init()
+    path, synthetic_bold = resolve_font_path(name, bold)
+    font = pygame.font.Font(path, size)
+    if synthetic_bold:
+        font.set_bold(True)
+    return font
@@ -2,6 +2,8 @@ import pygame
 from OpenGL.GL import *
 from OpenGL.GLU import gluProject
 import numpy as np
+from gui.fonts import load_font
+from physics.molecules import MoleculeCatalog, identify_molecules
 
 class HUD:
     """Heads-up display for showing simulation information."""
@@ -9,9 +11,9 @@ class HUD:
     def __init__(self, settings):
         self.settings = settings
         pygame.font.init() 
-        self.font = pygame.font.SysFont('Arial', 14)
-        self.title_font = pygame.font.SysFont('Arial', 16, bold=True)
-        self.molecule_font = pygame.font.SysFont('Arial', 13, bold=True) # Smaller for 3D labels
+        self.font = load_font('Arial', 14)
+        self.title_font = load_font('Arial', 16, bold=True)
+        self.molecule_font = load_font('Arial', 13, bold=True) # Smaller for 3D labels
         
         self.surface = None # Will be created in render
         
@@ -23,6 +25,8 @@ class HUD:
             "H2O": (150, 220, 255), "CH4": (180, 255, 180), "NH3": (180, 220, 255),
             "CO2": (220, 220, 220), "LiH": (220, 150, 250) 
         }
+        #Hash-keyed molecule names, shared across frames
+        self.molecule_catalog = MoleculeCatalog()
     
     def render(self, physics_engine, selected_atom=None):
         current_window_width, current_window_height = pygame.display.get_surface().get_size()
@@ -41,7 +45,7 @@ class HUD:
     def render_simulation_stats(self, physics_engine):
         """Render simulation statistics."""
         # Background for stats box
-        stats_rect = pygame.Rect(10, 10, 200, 100)
+        stats_rect = pygame.Rect(10, 10, 200, 170)
         pygame.draw.rect(self.surface, self.background_color, stats_rect)
         pygame.draw.rect(self.surface, self.text_color, stats_rect, 1)
         
@@ -51,13 +55,22 @@ class HUD:
         
         # Stats
         y = 40
+        islands = getattr(physics_engine, 'islands', None)
+        if islands is not None:
+            active, sleeping = islands.active_count, islands.sleeping_count
+        else:
+            active, sleeping = len(physics_engine.atoms), 0
         stats = [
             f"Atoms: {len(physics_engine.atoms)}",
             f"Time: {physics_engine.time:.2f} s",
             f"Status: {'Paused' if physics_engine.paused else 'Running'}",
             f"Speed: {physics_engine.time_scale:.1f}x",
-            f"Molecules: {len(physics_engine.identify_molecules())}"
+            f"Molecules: {len(physics_engine.identify_molecules())}",
+            f"Active: {active}  Sleeping: {sleeping}"
         ]
+        observables = getattr(physics_engine, 'observables', None)
+        if observables is not None and observables.latest:
+            stats.append(f"Temp: {observables.latest['temperature']:.1f} K  E: {observables.latest['total']:.3g}")
         
         for stat in stats:
             text = self.font.render(stat, True, self.text_color)
@@ -67,17 +80,17 @@ class HUD:
     def render_atom_info(self, atom):
         """Render information about the selected atom."""
         # Background for atom info box
-        info_rect = pygame.Rect(10, 120, 250, 180)
+        info_rect = pygame.Rect(10, 190, 250, 180)
         pygame.draw.rect(self.surface, self.background_color, info_rect)
         pygame.draw.rect(self.surface, self.text_color, info_rect, 1)
         
         # Title with element name
         title_text = f"Selected: {atom.element_name} ({atom.element_symbol})"
         title = self.title_font.render(title_text, True, self.highlight_color)
-        self.surface.blit(title, (20, 125))
+        self.surface.blit(title, (20, 195))
         
         # Atom information
-        y = 150
+        y = 220
         info = [
             f"Atomic Number: {atom.atomic_number}",
             f"Protons: {len(atom.protons)}",
@@ -96,7 +109,7 @@ class HUD:
     def render_molecule_info(self, physics_engine):
         """Render information about molecules in the simulation."""
         # Identify molecules
-        molecules = physics_engine.identify_common_molecules()
+        molecules = identify_molecules(physics_engine.atoms, self.molecule_catalog)
         
         if not molecules:
             return
@@ -116,11 +129,12 @@ class HUD:
             formula = molecule["formula"]
             name = molecule["name"]
             
-            # Choose color for molecule
-            if formula in self.molecule_colors:
+            # Choose color for molecule; fixed colours only apply to the matched reference structure,
+            # so an isomer sharing a reference formula keeps its own hash colour
+            if molecule.get("known") and formula in self.molecule_colors:
                 color = self.molecule_colors[formula]
             else:
-                color = self.text_color
+                color = molecule.get("color", self.text_color)
             
             text = self.font.render(name, True, color)
             self.surface.blit(text, (self.settings.WINDOW_WIDTH - 250, y))
@@ -0,0 +1,169 @@
+import numpy as np
+
+class AtomBVH:
+    #Bounding volume hierarchy over atom bounding spheres for ray picking.
+    #Nodes are stored in flat arrays and leaves cover contiguous runs of a permutation of the atoms,
+    #so refitting after a step is a handful of vectorized reductions instead of a rebuild.
+    #The tree is rebuilt only when the atom set changes or refitting has loosened it too much.
+
+    LEAF_SIZE = 4
+    #Rebuild once the refitted root surface area has grown by this factor since the last build
+    REBUILD_GROWTH = 2.0
+
+    def __init__(self):
+        self.atoms = []
+        self._atom_ids = []
+        self.centers = np.zeros((0, 3))
+        self.radii = np.zeros(0)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.lower = np.zeros((0, 3))
+        self.upper = np.zeros((0, 3))
+        self.left = np.zeros(0, dtype=np.int64)
+        self.right = np.zeros(0, dtype=np.int64)
+        self.start = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros(0, dtype=np.int64)
+        self._levels = []
+        self._leaves = np.zeros(0, dtype=np.int64)
+        self._built_area = 0.0
+
+    def sync(self, atoms):
+        #Bring the hierarchy up to date with the atoms: refit if the set is unchanged, else rebuild.
+        ids = [id(atom) for atom in atoms]
+        centers = np.array([atom.position for atom in atoms], dtype=np.float64).reshape(-1, 3)
+        if ids != self._atom_ids:
+            self.build(atoms, centers)
+            return
+        self.centers = centers
+        #Radii change when an atom gains or loses an outer shell, so refresh them with the centres
+        self.refit(np.array([atom.bounding_radius for atom in atoms], dtype=np.float64))
+        if self._surface_area(0) > self.REBUILD_GROWTH * self._built_area:
+            self.build(atoms, centers)
+
+    def build(self, atoms, centers=None):
+        #Build the tree top-down, splitting at the median of the longest axis.
+        self.atoms = list(atoms)
+        self._atom_ids = [id(atom) for atom in self.atoms]
+        if centers is None:
+            centers = np.array([atom.position for atom in self.atoms], dtype=np.float64).reshape(-1, 3)
+        self.centers = centers
+        self.radii = np.array([atom.bounding_radius for atom in self.atoms], dtype=np.float64)
+        count = len(self.atoms)
+        self.order = np.arange(count)
+
+        left, right, start, size, depth = [], [], [], [], []
+        if count:
+            stack = [(0, count, 0, -1, False)]
+            while stack:
+                first, last, level, parent, is_right = stack.pop()
+                node = len(start)
+                left.append(-1)
+                right.append(-1)
+                start.append(first)
+                size.append(last - first)
+                depth.append(level)
+                if parent >= 0:
+                    if is_right:
+                        right[parent] = node
+                    else:
+                        left[parent] = node
+                if last - first <= self.LEAF_SIZE:
+                    continue
+                indices = self.order[first:last]
+                points = self.centers[indices]
+                axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+                middle = (last - first) // 2
+                partition = np.argpartition(points[:, axis], middle)
+                self.order[first:last] = indices[partition]
+                stack.append((first + middle, last, level + 1, node, True))
+                stack.append((first, first + middle, level + 1, node, False))
+
+        self.left = np.array(left, dtype=np.int64)
+        self.right = np.array(right, dtype=np.int64)
+        self.start = np.array(start, dtype=np.int64)
+        self.count = np.array(size, dtype=np.int64)
+        depth = np.array(depth, dtype=np.int64)
+        internal = self.left >= 0
+        self._leaves = np.nonzero(~internal)[0]
+        self._leaves = self._leaves[np.argsort(self.start[self._leaves])]
+        self._levels = [np.nonzero(internal & (depth == level))[0] for level in range(int(depth.max(initial=0)), -1, -1)]
+        self.lower = np.zeros((len(start), 3))
+        self.upper = np.zeros((len(start), 3))
+        self.refit()
+        self._built_area = self._surface_area(0) if count else 0.0
+
+    def refit(self, radii=None):
+        #Recompute node bounds bottom-up for the current centers (and optionally new radii).
+        if radii is not None:
+            self.radii = np.asarray(radii, dtype=np.float64)
+        if len(self.start) == 0:
+            return
+        centers = self.centers[self.order]
+        radii = self.radii[self.order][:, None]
+        starts = self.start[self._leaves]
+        self.lower[self._leaves] = np.minimum.reduceat(centers - radii, starts, axis=0)
+        self.upper[self._leaves] = np.maximum.reduceat(centers + radii, starts, axis=0)
+        for nodes in self._levels:
+            if len(nodes):
+                self.lower[nodes] = np.minimum(self.lower[self.left[nodes]], self.lower[self.right[nodes]])
+                self.upper[nodes] = np.maximum(self.upper[self.left[nodes]], self.upper[self.right[nodes]])
+
+    def _surface_area(self, node):
+        if len(self.start) == 0:
+            return 0.0
+        extent = self.upper[node] - self.lower[node]
+        return float(2.0 * (extent[0] * extent[1] + extent[1] * extent[2] + extent[2] * extent[0]))
+
+    def _ray_box(self, node, origin, inverse, best):
+        #Entry distance of the ray into a node's box, or None if it misses (or lies beyond `best`).
+        t1 = (self.lower[node] - origin) * inverse
+        t2 = (self.upper[node] - origin) * inverse
+        near = np.max(np.minimum(t1, t2))
+        far = np.min(np.maximum(t1, t2))
+        if far < max(near, 0.0) or near > best:
+            return None
+        return near
+
+    def ray_cast(self, origin, direction):
+        #Nearest atom whose bounding sphere the ray hits, and the hit distance along the ray.
+        if len(self.start) == 0:
+            return None, np.inf
+        origin = np.asarray(origin, dtype=np.float64)
+        direction = np.asarray(direction, dtype=np.float64)
+        direction = direction / np.linalg.norm(direction)
+        #Nudge zero components so the slab test never computes 0 * inf
+        inverse = 1.0 / np.where(np.abs(direction) < 1e-12, 1e-12, direction)
+
+        best_distance, best_index = np.inf, -1
+        stack = [0] if self._ray_box(0, origin, inverse, best_distance) is not None else []
+        while stack:
+            node = stack.pop()
+            if self._ray_box(node, origin, inverse, best_distance) is None:
+                continue
+            if self.left[node] < 0:
+                indices = self.order[self.start[node]:self.start[node] + self.count[node]]
+                offset = origin - self.centers[indices]
+                b = offset @ direction
+                c = np.einsum('ij,ij->i', offset, offset) - self.radii[indices] ** 2
+                discriminant = b * b - c
+                hit = discriminant >= 0
+                if not np.any(hit):
+                    continue
+                root = np.sqrt(np.where(hit, discriminant, 0.0))
+                distance = np.where(-b - root >= 0, -b - root, -b + root)
+                distance = np.where(hit & (distance >= 0), distance, np.inf)
+                nearest = int(np.argmin(distance))
+                if distance[nearest] < best_distance:
+                    best_distance, best_index = float(distance[nearest]), int(indices[nearest])
+                continue
+            #Visit the nearer child first so the far one is usually culled by best_distance
+            children = []
+            for child in (self.left[node], self.right[node]):
+                entry = self._ray_box(child, origin, inverse, best_distance)
+                if entry is not None:
+                    children.append((entry, child))
+            children.sort(reverse=True)
+            stack.extend(child for _, child in children)
+
+        if best_index < 0:
+            return None, np.inf
+        return self.atoms[best_index], best_distance
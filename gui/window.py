@@ -1,16 +1,19 @@
-import pygame
-from pygame.locals import *
-from OpenGL.GL import *
-from OpenGL.GLU import *
 import numpy as np
-from gui.controls import ControlPanel
-from gui.hud import HUD
+from gui.picking import AtomBVH
+from visualization.export import FrameExporter
+
+#pygame, PyOpenGL and the GL-backed HUD/control panel are imported when a window is created,
+#so importing this module (e.g. for headless runs or tooling) stays cheap.
 
 class SimulationWindow:
     #this is the main window for the 3D atomic simulation.
     
     def __init__(self, settings, physics_engine, renderer):
         #initialize the simulation window.
+        import pygame
+        from gui.controls import ControlPanel
+        from gui.hud import HUD
+        
         self.settings = settings
         self.physics_engine = physics_engine
         self.renderer = renderer
@@ -25,7 +28,88 @@ class SimulationWindow:
         self.mouse_prev_pos = (0, 0)
         self.is_dragging = False
         self.selected_atom = None
+        self.hovered_atom = None
+        
+        #Picking hierarchy over atom bounding spheres, refit once per step
+        self.atom_bvh = AtomBVH()
+        
+        #Frame export (movie) mode; see start_export()
+        self.exporter = None
+        self.export_frame_dt = None
         
         #Clock for frame timing
         self.clock = pygame.time.Clock()
-        self.running = True
\ No newline at end of file
+        self.running = True
+    
+    def refresh_picking(self):
+        #Refit the picking hierarchy to the latest atom positions; call once per simulation step.
+        self.atom_bvh.sync(self.physics_engine.atoms)
+    
+    def mouse_ray(self, mouse_pos):
+        #World-space ray through a window pixel, using the current camera matrices.
+        from OpenGL.GL import glGetDoublev, glGetIntegerv, GL_MODELVIEW_MATRIX, GL_PROJECTION_MATRIX, GL_VIEWPORT
+        from OpenGL.GLU import gluUnProject
+        
+        modelview = glGetDoublev(GL_MODELVIEW_MATRIX)
+        projection = glGetDoublev(GL_PROJECTION_MATRIX)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        x = mouse_pos[0]
+        y = viewport[3] - mouse_pos[1]
+        near = np.array(gluUnProject(x, y, 0.0, modelview, projection, viewport))
+        far = np.array(gluUnProject(x, y, 1.0, modelview, projection, viewport))
+        return near, far - near
+    
+    def pick_atom(self, mouse_pos):
+        #Nearest atom under the mouse, or None.
+        if len(self.atom_bvh.atoms) != len(self.physics_engine.atoms):
+            self.refresh_picking()
+        origin, direction = self.mouse_ray(mouse_pos)
+        atom, _ = self.atom_bvh.ray_cast(origin, direction)
+        return atom
+    
+    def update_hover(self, mouse_pos):
+        #Track the atom under the mouse for hover highlighting.
+        self.hovered_atom = self.pick_atom(mouse_pos)
+        return self.hovered_atom
+    
+    def viewport_size(self):
+        #(width, height) of the GL viewport: the framebuffer actually drawn, which differs from
+        #WINDOW_WIDTH/HEIGHT after a resize or on high-DPI displays.
+        from OpenGL.GL import glGetIntegerv, GL_VIEWPORT
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        return int(viewport[2]), int(viewport[3])
+    
+    def start_export(self, directory, frame_dt=None, workers=None):
+        #Start writing every rendered frame to `directory` as numbered PNGs.
+        #While exporting, each frame advances the simulation by a fixed frame_dt (EXPORT_FRAME_DT)
+        #instead of the wall-clock frame time, so a given run always produces the same movie.
+        if self.exporter is not None:
+            self.stop_export()
+        self.export_frame_dt = frame_dt if frame_dt is not None else getattr(self.settings, 'EXPORT_FRAME_DT', 1.0 / 60.0)
+        width, height = self.viewport_size()
+        self.exporter = FrameExporter(
+            directory, width, height,
+            workers=workers if workers is not None else getattr(self.settings, 'EXPORT_WORKERS', 2)
+        )
+        return self.exporter
+    
+    def stop_export(self):
+        #Flush outstanding frames and leave export mode; returns the number of frames written.
+        if self.exporter is None:
+            return 0
+        written = self.exporter.finish()
+        self.exporter = None
+        self.export_frame_dt = None
+        return written
+    
+    def simulation_dt(self, frame_seconds):
+        #Simulation time to advance for a frame that took `frame_seconds` of wall time.
+        if self.exporter is not None:
+            return self.export_frame_dt
+        return frame_seconds * self.physics_engine.time_scale
+    
+    def capture_export_frame(self):
+        #Hand the frame just rendered to the exporter; call after drawing, before the buffer flip.
+        if self.exporter is not None:
+            self.exporter.resize(*self.viewport_size())
+            self.exporter.capture()
@@ -3,6 +3,21 @@ import random
 from models.electron import Electron
 from models.proton import Proton
 from models.neutron import Neutron
+from physics.utils import box_lengths, is_periodic, wrap_positions
+from physics.quantum import fit_orbits, evaluate_orbits, orbital_radius
+
+#Element names and symbols by atomic number
+ELEMENTS = {
+    1: ("Hydrogen", "H"),
+    2: ("Helium", "He"),
+    3: ("Lithium", "Li"),
+    4: ("Beryllium", "Be"),
+    5: ("Boron", "B"),
+    6: ("Carbon", "C"),
+    7: ("Nitrogen", "N"),
+    8: ("Oxygen", "O"),
+    #Add more elements as needed
+}
 
 class Atom:
     #Represents an atom with nucleus and electrons.
@@ -33,6 +48,20 @@ class Atom:
         self.electron_shell_radii = []
         self.color = (0.0, 0.0, 0.0)
         
+        #Cached nucleon layout, generated lazily for the renderer
+        self._nucleon_seed = random.getrandbits(32)
+        self._nucleon_offsets = None
+        self._nucleon_jitter = {}
+        
+        #Physics level of detail: closed-form electron orbits instead of force integration
+        self.analytic_orbits = False
+        self._orbits = None
+        self._orbit_clock = 0.0
+        
+        #Activity tracking for island sleeping
+        self.sleeping = False
+        self.sleep_timer = 0.0
+        
         #For interactions
         self.bonds = []
         
@@ -46,19 +75,36 @@ class Atom:
         #Calculate the net charge of the atom.
         return len(self.protons) - len(self.electrons)
     
+    @property
+    def bounding_radius(self):
+        #Radius of a sphere enclosing the nucleus and the outermost occupied shell.
+        if not self.electrons:
+            return self.nucleus_radius
+        outermost = max(electron.principal_quantum_number for electron in self.electrons)
+        return max(self.nucleus_radius, orbital_radius(outermost, self.settings))
+    
     def update(self, dt):
         #Update the atom and all its particles.
-        # Update nucleus position
+        self.advance_nucleus(dt)
+        self.update_electrons(dt)
+    
+    def advance_nucleus(self, dt):
+        #Move the atom centre by its velocity.
         self.position += self.velocity * dt
+        if is_periodic(self.settings):
+            self.wrap_into_box()
         
-        #Update nucleons (simplified as in reality they have much more complex interactions)
-        for proton in self.protons:
-            proton.position = self.position + np.random.normal(0, self.nucleus_radius / 3, 3)
-            proton.update_position(dt)
-            
-        for neutron in self.neutrons:
-            neutron.position = self.position + np.random.normal(0, self.nucleus_radius / 3, 3)
-            neutron.update_position(dt)
+        #The nucleus moves as a rigid aggregate; individual nucleon positions are
+        #only placed on demand by update_nucleon_positions() when they are drawn
+    
+    def update_electrons(self, dt):
+        #Advance the electrons around the nucleus.
+        if self.analytic_orbits:
+            if self._orbits is None or len(self._orbits["omega"]) != len(self.electrons):
+                self.refit_orbits()
+            self._orbit_clock += dt
+            self._advance_analytic_orbits()
+            return
         
         #Update electrons with quantum mechanical model
         for electron in self.electrons:
@@ -78,10 +124,127 @@ class Atom:
                 quantum_fluctuation = np.random.normal(0, self.settings.QUANTUM_FLUCTUATION, 3)
                 electron.apply_force(quantum_fluctuation)
     
+    def electron_force_coefficients(self):
+        #Per-electron c such that the nuclear force on an electron at offset r is c * r / |r|^3
+        #(the same Coulomb term update_electrons applies), with the matching potential c / |r|.
+        return np.array([-self.settings.COULOMB_CONSTANT * electron.charge * self.atomic_number
+                         for electron in self.electrons], dtype=np.float64)
+    
+    def wake(self):
+        #Wake the atom (and, on the next island update, its whole island).
+        self.sleeping = False
+        self.sleep_timer = 0.0
+    
+    def apply_impulse(self, delta_velocity):
+        #Change the atom's velocity from an external kick and wake it.
+        self.velocity += np.asarray(delta_velocity, dtype=np.float32)
+        self.wake()
+    
+    def set_analytic_orbits(self, enabled):
+        #Switch between full force integration and closed-form orbits for this atom's electrons.
+        #The orbit is fitted to the current electron states and handed back exactly, so neither
+        #direction of the switch makes electrons jump.
+        if enabled == self.analytic_orbits:
+            return
+        if enabled:
+            self._orbits = fit_orbits(self.electrons, self.position, self.settings)
+            self._orbit_clock = 0.0
+        else:
+            if self._orbits is not None and len(self._orbits["omega"]) == len(self.electrons):
+                offsets, velocities = evaluate_orbits(self._orbits, self._orbit_clock)
+                for electron, offset, velocity in zip(self.electrons, offsets, velocities):
+                    electron.position = self.position + offset.astype(np.float32)
+                    electron.velocity = velocity.astype(np.float32)
+                    electron.clear_forces()
+            self._orbits = None
+        self.analytic_orbits = enabled
+    
+    def refit_orbits(self):
+        #Refit the orbits to the electrons' current states (no-op unless orbits are analytic).
+        if self.analytic_orbits:
+            self._orbits = fit_orbits(self.electrons, self.position, self.settings)
+            self._orbit_clock = 0.0
+        else:
+            self._orbits = None
+    
+    def _advance_analytic_orbits(self):
+        #Place electrons on their fitted orbits at the current orbit clock.
+        #Velocities are written too, so captured or refitted states stay on the same orbit
+        offsets, velocities = evaluate_orbits(self._orbits, self._orbit_clock)
+        positions = (self.position + offsets).astype(np.float32)
+        for electron, position, velocity in zip(self.electrons, positions, velocities.astype(np.float32)):
+            electron.position = position
+            electron.velocity = velocity
+            electron.orbital_path.append(position)
+            if len(electron.orbital_path) > electron.max_path_points:
+                electron.orbital_path.pop(0)
+    
+    def wrap_into_box(self):
+        #Wrap the atom back into the periodic box, carrying all its particles along.
+        wrapped = wrap_positions(self.position, box_lengths(self.settings))
+        shift = (wrapped - self.position).astype(np.float32)
+        if not np.any(shift):
+            return
+        self.position += shift
+        for electron in self.electrons:
+            electron.position += shift
+            electron.orbital_path = []  #avoid trails drawn across the box
+    
+    def nucleus_detail_visible(self, screen_radius):
+        #True when the nucleus covers enough pixels for individual nucleons to be worth drawing.
+        min_pixels = getattr(self.settings, 'NUCLEON_DETAIL_MIN_PIXELS', 6.0)
+        return len(self.protons) + len(self.neutrons) > 1 and screen_radius >= min_pixels
+    
+    def nucleon_offsets(self):
+        #Offsets of every nucleon (protons first, then neutrons) from the atom centre.
+        #Generated once per nucleus composition from a per-atom seed and cached.
+        count = len(self.protons) + len(self.neutrons)
+        if self._nucleon_offsets is None or len(self._nucleon_offsets) != count:
+            rng = np.random.default_rng((self._nucleon_seed, self.mass_number))
+            self._nucleon_offsets = self._sample_in_nucleus(rng, count)
+            self._nucleon_jitter = {}
+        return self._nucleon_offsets
+    
+    def _sample_in_nucleus(self, rng, count):
+        #Uniform points inside the nucleus sphere.
+        directions = rng.normal(size=(count, 3))
+        directions /= np.maximum(np.linalg.norm(directions, axis=1), 1e-12)[:, None]
+        radii = self.nucleus_radius * rng.random(count) ** (1 / 3)
+        return (directions * radii[:, None]).astype(np.float32)
+    
+    def _jitter_set(self, epoch):
+        #Cached jitter pattern for one animation epoch; only the two most recent are kept.
+        if epoch not in self._nucleon_jitter:
+            count = len(self.protons) + len(self.neutrons)
+            rng = np.random.default_rng((self._nucleon_seed, self.mass_number, epoch))
+            self._nucleon_jitter = {key: value for key, value in self._nucleon_jitter.items() if key >= epoch - 1}
+            self._nucleon_jitter[epoch] = self._sample_in_nucleus(rng, count)
+        return self._nucleon_jitter[epoch]
+    
+    def update_nucleon_positions(self, sim_time=None):
+        #Place protons and neutrons around the nucleus for rendering and return their positions.
+        #With NUCLEON_JITTER_RATE > 0 the layout drifts smoothly between random patterns at that rate,
+        #so at most one new pattern is sampled per period instead of one RNG call per nucleon per step.
+        offsets = self.nucleon_offsets()
+        rate = getattr(self.settings, 'NUCLEON_JITTER_RATE', 0.0)
+        if rate > 0 and sim_time is not None and len(offsets):
+            phase = sim_time * rate
+            epoch = int(np.floor(phase))
+            blend = np.float32(phase - epoch)
+            amplitude = getattr(self.settings, 'NUCLEON_JITTER_AMPLITUDE', 0.15)
+            jitter = (1 - blend) * self._jitter_set(epoch) + blend * self._jitter_set(epoch + 1)
+            offsets = offsets + amplitude * jitter
+        
+        positions = self.position + offsets
+        for nucleon, position in zip(self.protons + self.neutrons, positions):
+            nucleon.position = position
+        return positions
+    
     def add_proton(self):
         #Add a proton to the nucleus.
         proton = Proton(position=self.position + np.random.normal(0, 0.01, 3), settings=self.settings)
         self.protons.append(proton)
+        self._nucleon_offsets = None
         self.atomic_number += 1
         self.mass_number += 1
         self.update_element_info()
@@ -92,10 +255,26 @@ class Atom:
         #Add a neutron to the nucleus.
         neutron = Neutron(position=self.position + np.random.normal(0, 0.01, 3), settings=self.settings)
         self.neutrons.append(neutron)
+        self._nucleon_offsets = None
         self.mass_number += 1
         self.update_nucleus_radius()
         return neutron
     
+    def decay_neutron(self, neutron):
+        #Beta decay: turn one neutron into a proton and return the emitted electron.
+        #The electron leaves the atom, so the atom is left as a positive ion.
+        self.neutrons.remove(neutron)
+        proton = Proton(position=neutron.position, settings=self.settings)
+        self.protons.append(proton)
+        self._nucleon_offsets = None
+        self.atomic_number += 1
+        self.update_element_info()
+        
+        direction = np.random.normal(0, 1, 3)
+        direction /= np.linalg.norm(direction)
+        speed = getattr(self.settings, 'BETA_ELECTRON_SPEED', 5.0)
+        return Electron(position=self.position.copy(), velocity=direction * speed, settings=self.settings)
+    
     def add_electron(self, n=1, l=0, m=0, spin=0.5):
         #Add an electron to the atom in specified orbital.
         electron = Electron.create_for_orbital(n, l, m, spin, self.position, self.settings)
@@ -133,20 +312,8 @@ class Atom:
     
     def update_element_info(self):
         #Update element name and symbol based on atomic number.
-        elements = {
-            1: ("Hydrogen", "H"),
-            2: ("Helium", "He"),
-            3: ("Lithium", "Li"),
-            4: ("Beryllium", "Be"),
-            5: ("Boron", "B"),
-            6: ("Carbon", "C"),
-            7: ("Nitrogen", "N"),
-            8: ("Oxygen", "O"),
-            #Add more elements as needed
-        }
-        
-        if self.atomic_number in elements:
-            self.element_name, self.element_symbol = elements[self.atomic_number]
+        if self.atomic_number in ELEMENTS:
+            self.element_name, self.element_symbol = ELEMENTS[self.atomic_number]
         else:
             self.element_name = f"Element-{self.atomic_number}"
             self.element_symbol = f"E{self.atomic_number}"
@@ -157,6 +324,13 @@ class Atom:
         r0 = self.settings.NUCLEUS_RADIUS_CONSTANT
         self.nucleus_radius = r0 * (self.mass_number ** (1/3))
     
+    @staticmethod
+    def default_neutron_count(atomic_number):
+        #Simple approximation for stable isotopes
+        if atomic_number <= 20:
+            return atomic_number
+        return int(1.5 * atomic_number)
+    
     @staticmethod
     def create_element(atomic_number, neutron_count=None, position=None, settings=None):
         #Create an atom of a specified element.
@@ -168,11 +342,7 @@ class Atom:
         
         #Add neutrons (default to stable isotope)
         if neutron_count is None:
-            #Simple approximation for stable isotopes
-            if atomic_number <= 20:
-                neutron_count = atomic_number
-            else:
-                neutron_count = int(1.5 * atomic_number)
+            neutron_count = Atom.default_neutron_count(atomic_number)
         
         for _ in range(neutron_count):
             atom.add_neutron()
@@ -182,6 +352,32 @@ class Atom:
         
         return atom
     
+    def clone(self, position, velocity=None, electron_positions=None, electron_velocities=None):
+        #Copy of this atom at `position`, used to stamp out many atoms of one element quickly.
+        #Nucleons and (unless given) electrons keep their offsets from the nucleus.
+        position = np.array(position, dtype=np.float32)
+        shift = position - self.position
+        atom = Atom.__new__(Atom)
+        atom.__dict__.update(self.__dict__)
+        atom.position = position
+        atom.velocity = np.array(self.velocity if velocity is None else velocity, dtype=np.float32)
+        atom.protons = [proton.clone(proton.position + shift) for proton in self.protons]
+        atom.neutrons = [neutron.clone(neutron.position + shift) for neutron in self.neutrons]
+        if electron_positions is None:
+            electron_positions = [electron.position + shift for electron in self.electrons]
+        if electron_velocities is None:
+            electron_velocities = [electron.velocity for electron in self.electrons]
+        atom.electrons = [electron.clone(electron_position, electron_velocity) for electron, electron_position, electron_velocity
+                          in zip(self.electrons, electron_positions, electron_velocities)]
+        atom.electron_shell_radii = list(self.electron_shell_radii)
+        atom._nucleon_seed = random.getrandbits(32)
+        atom._nucleon_offsets = None
+        atom._nucleon_jitter = {}
+        atom._orbits = None
+        atom._orbit_clock = 0.0
+        atom.bonds = []
+        return atom
+    
     @staticmethod
     def create_random(settings):
         #Create a random atom within parameters.
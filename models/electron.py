@@ -39,6 +39,12 @@ class Electron(Particle):
         if len(self.orbital_path) > self.max_path_points:
             self.orbital_path.pop(0)
     
+    def clone(self, position, velocity=None):
+        #Copy of this electron at another position, with its own (empty) orbital path.
+        electron = super().clone(position, velocity)
+        electron.orbital_path = []
+        return electron
+    
     @staticmethod
     def create_for_orbital(n, l, m, spin, nucleus_position, settings):
         #Create an electron configured for a specific orbital.
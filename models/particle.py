@@ -6,7 +6,7 @@ class Particle:
     
     def __init__(self, position=None, velocity=None, mass=0, charge=0, spin=0, settings=None):
         #Initialize a quantum particle with physical properties.
-        self.id = uuid4()  # Unique identifier
+        self._id = uuid4()  # Unique identifier
         self.settings = settings
         
         #position and motion (3D vectors)
@@ -33,6 +33,13 @@ class Particle:
             "probability_density": None
         }
         
+    @property
+    def id(self):
+        #Unique identifier; clones draw theirs on first use since uuid4() dominates cloning cost.
+        if self._id is None:
+            self._id = uuid4()
+        return self._id
+    
     def update_position(self, dt):
         #Update the particle position based on velocity and acceleration.
         self.velocity += self.acceleration * dt
@@ -41,6 +48,18 @@ class Particle:
         #reset acceleration for next frame
         self.acceleration = np.zeros(3, dtype=np.float32)
     
+    def clone(self, position, velocity=None):
+        #Copy of this particle at another position, much cheaper than running __init__ again.
+        particle = self.__class__.__new__(self.__class__)
+        particle.__dict__.update(self.__dict__)
+        particle._id = None
+        particle.quantum_state = dict(self.quantum_state)
+        particle.position = np.array(position, dtype=np.float32)
+        particle.velocity = np.array(self.velocity if velocity is None else velocity, dtype=np.float32)
+        particle.acceleration = np.zeros(3, dtype=np.float32)
+        particle.forces = []
+        return particle
+    
     def apply_force(self, force_vector):
         #Apply a force to the particle.
         if self.mass > 0:
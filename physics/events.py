@@ -0,0 +1,97 @@
+import heapq
+import itertools
+import math
+import numpy as np
+
+class EventScheduler:
+    #Priority queue of timed events keyed by the object they belong to.
+    #Cancelling (or rescheduling) a key is O(1): stale heap entries are skipped when they surface,
+    #and the heap is compacted once they outnumber live entries.
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._live = {}
+
+    def __len__(self):
+        return len(self._live)
+
+    def schedule(self, time, key, action):
+        #Run action(time) once simulation time reaches `time`; replaces any pending event for `key`.
+        token = next(self._counter)
+        self._live[key] = token
+        heapq.heappush(self._heap, (time, token, key, action))
+
+    def cancel(self, key):
+        #Drop the pending event for `key`, if any.
+        if self._live.pop(key, None) is not None and len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [entry for entry in self._heap if self._live.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+
+    def next_time(self):
+        #Time of the earliest live event, or infinity.
+        while self._heap and self._live.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else math.inf
+
+    def run_until(self, now):
+        #Fire every event due by `now` in time order; returns how many fired.
+        fired = 0
+        while self.next_time() <= now:
+            time, token, key, action = heapq.heappop(self._heap)
+            del self._live[key]
+            action(time)
+            fired += 1
+        return fired
+
+class NeutronDecayProcess:
+    #Beta decay of neutrons driven by pre-sampled exponential decay times.
+    #Each tracked neutron gets one heap entry, so the per-step cost is a peek at the heap and each
+    #decay costs O(log N), rather than one random roll per neutron per step.  When a decay fires
+    #the neutron becomes a proton (raising the atom's atomic number) and an electron is emitted.
+
+    def __init__(self, scheduler, settings, rng=None, on_emit=None):
+        self.scheduler = scheduler
+        self.settings = settings
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.on_emit = on_emit
+        #879.4 s is the free neutron's mean lifetime (half-life ~609.6 s); an explicit
+        #NEUTRON_HALF_LIFE setting is still honoured
+        half_life = getattr(settings, 'NEUTRON_HALF_LIFE', None)
+        if half_life is not None:
+            self.rate = math.log(2.0) / half_life
+        else:
+            self.rate = 1.0 / getattr(settings, 'NEUTRON_LIFETIME', 879.4)
+        self.emitted = []
+        self.decays = 0
+
+    def track_atom(self, atom, now):
+        #Schedule decays for all neutrons of an atom.
+        times = now + self.rng.exponential(1.0 / self.rate, len(atom.neutrons))
+        for neutron, time in zip(atom.neutrons, times.tolist()):
+            self._schedule(atom, neutron, time)
+
+    def untrack_atom(self, atom):
+        #Cancel pending decays, e.g. when the atom is removed from the simulation.
+        for neutron in atom.neutrons:
+            self.scheduler.cancel(neutron)
+
+    def resample_atom(self, atom, now):
+        #Reschedule after the atom's nucleus changed; valid because decay is memoryless.
+        self.untrack_atom(atom)
+        self.track_atom(atom, now)
+
+    def _schedule(self, atom, neutron, time):
+        neutron.decay_probability = self.rate  #decay rate per unit time
+        neutron.decay_timer = time             #simulation time of the scheduled decay
+        self.scheduler.schedule(time, neutron, lambda fired_at: self._decay(atom, neutron, fired_at))
+
+    def _decay(self, atom, neutron, time):
+        if neutron not in atom.neutrons:
+            return
+        electron = atom.decay_neutron(neutron)
+        self.decays += 1
+        if self.on_emit is not None:
+            self.on_emit(atom, electron, time)
+        else:
+            self.emitted.append(electron)
@@ -0,0 +1,317 @@
+import math
+import numpy as np
+from physics.utils import minimum_image, box_lengths
+
+#Coefficients of the Abramowitz & Stegun 7.1.26 erfc approximation (absolute error < 1.5e-7)
+_ERFC_P = 0.3275911
+_ERFC_A = (0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429)
+
+def erfc(x):
+    #Vectorized complementary error function for non-negative arguments.
+    x = np.asarray(x, dtype=np.float64)
+    t = 1.0 / (1.0 + _ERFC_P * x)
+    a1, a2, a3, a4, a5 = _ERFC_A
+    poly = t * (a1 + t * (a2 + t * (a3 + t * (a4 + t * a5))))
+    return poly * np.exp(-x * x)
+
+def ewald_alpha(cutoff, tolerance):
+    #Splitting parameter so the real-space term has decayed to `tolerance` at the cutoff.
+    #Solves erfc(alpha * cutoff) = tolerance by bisection.
+    low, high = 0.0, 1.0
+    while math.erfc(high * cutoff) > tolerance:
+        high *= 2.0
+    for _ in range(60):
+        mid = 0.5 * (low + high)
+        if math.erfc(mid * cutoff) > tolerance:
+            low = mid
+        else:
+            high = mid
+    return high
+
+def reciprocal_extent(alpha, tolerance):
+    #Largest reciprocal vector |m| needed so exp(-pi^2 m^2 / alpha^2) falls below `tolerance`.
+    return alpha * math.sqrt(-math.log(tolerance)) / math.pi
+
+#The mesh estimate assumes uncorrelated charges; relative energy errors of neutral systems, whose
+#total energy is a small difference of large terms, run several times higher, so the mesh is sized
+#for an estimated force error this many times below the tolerance.
+_MESH_ERROR_MARGIN = 8.0
+
+def _fft_friendly(n):
+    #Smallest even size >= n whose only prime factors are 2, 3 and 5.
+    n = max(int(math.ceil(n)), 4)
+    while True:
+        if n % 2 == 0:
+            m = n
+            for p in (2, 3, 5):
+                while m % p == 0:
+                    m //= p
+            if m == 1:
+                return n
+        n += 1
+
+def gather_charges(atoms, resolve_electrons=False):
+    #Collect point charges from a list of atoms.
+    #By default each atom contributes its net charge at its centre (ions only);
+    #with resolve_electrons the nucleus and every electron are separate charges.
+    if not resolve_electrons:
+        positions = np.array([atom.position for atom in atoms], dtype=np.float64).reshape(-1, 3)
+        charges = np.array([atom.charge for atom in atoms], dtype=np.float64)
+        return positions, charges
+
+    positions = []
+    charges = []
+    for atom in atoms:
+        positions.append(atom.position)
+        charges.append(atom.atomic_number)
+        for electron in atom.electrons:
+            positions.append(electron.position)
+            charges.append(electron.charge)
+    return np.array(positions, dtype=np.float64).reshape(-1, 3), np.array(charges, dtype=np.float64)
+
+def all_pairs(count):
+    #Index arrays (i, j) with i < j over every pair of `count` particles.
+    i, j = np.triu_indices(count, k=1)
+    return i, j
+
+def real_space(positions, charges, box, alpha, cutoff, pairs=None):
+    #Short-range erfc-screened Coulomb energy and forces under the minimum image convention.
+    #`pairs` is an optional (i, j) candidate list (e.g. from a neighbor list); all pairs otherwise.
+    positions = np.asarray(positions, dtype=np.float64)
+    charges = np.asarray(charges, dtype=np.float64)
+    forces = np.zeros_like(positions)
+    if pairs is None:
+        pairs = all_pairs(len(positions))
+    i, j = pairs
+    if len(i) == 0:
+        return 0.0, forces
+
+    delta = minimum_image(positions[i] - positions[j], box)
+    r2 = np.einsum('ij,ij->i', delta, delta)
+    mask = (r2 < cutoff * cutoff) & (r2 > 0)
+    i, j, delta, r2 = i[mask], j[mask], delta[mask], r2[mask]
+    r = np.sqrt(r2)
+
+    qq = charges[i] * charges[j]
+    screened = erfc(alpha * r) / r
+    energy = np.sum(qq * screened)
+
+    #-dU/dr divided by r, so multiplying by the displacement gives the force on i
+    magnitude = qq * (screened + 2.0 * alpha / math.sqrt(math.pi) * np.exp(-alpha * alpha * r2)) / r2
+    pair_force = delta * magnitude[:, None]
+    for axis in range(3):
+        forces[:, axis] += np.bincount(i, weights=pair_force[:, axis], minlength=len(positions))
+        forces[:, axis] -= np.bincount(j, weights=pair_force[:, axis], minlength=len(positions))
+    return float(energy), forces
+
+def self_and_background(charges, box, alpha):
+    #Self-interaction correction plus the neutralizing background term for charged systems.
+    volume = float(np.prod(box))
+    self_energy = -alpha / math.sqrt(math.pi) * np.sum(charges * charges)
+    net = np.sum(charges)
+    background = -math.pi * net * net / (2.0 * volume * alpha * alpha)
+    return float(self_energy + background)
+
+def direct_ewald(positions, charges, box, alpha, cutoff, kmax, coulomb_constant=1.0):
+    #Reference Ewald sum with an explicit reciprocal-space loop over all |m_i| <= kmax.
+    #Costs O(N * kmax^3); intended for validating the mesh solver on small systems.
+    positions = np.asarray(positions, dtype=np.float64)
+    charges = np.asarray(charges, dtype=np.float64)
+    box = np.asarray(box, dtype=np.float64)
+    volume = float(np.prod(box))
+
+    energy, forces = real_space(positions, charges, box, alpha, cutoff)
+
+    span = np.arange(-kmax, kmax + 1)
+    m = np.stack(np.meshgrid(span, span, span, indexing='ij'), axis=-1).reshape(-1, 3)
+    m = m[np.any(m != 0, axis=1)]
+    k = m / box
+    k2 = np.einsum('ij,ij->i', k, k)
+    weight = np.exp(-math.pi * math.pi * k2 / (alpha * alpha)) / k2
+
+    phase = np.exp(2j * math.pi * (positions @ k.T))  #(N, M)
+    structure = charges @ phase
+    energy += np.sum(weight * np.abs(structure) ** 2) / (2.0 * math.pi * volume)
+
+    #F_i = 2 q_i / V * sum_m w(m) k Im(e^{2 pi i k.r_i} S(m)*)
+    im = np.imag(phase * np.conj(structure)[None, :])
+    forces += 2.0 * charges[:, None] / volume * ((im * weight[None, :]) @ k)
+
+    energy += self_and_background(charges, box, alpha)
+    return coulomb_constant * energy, coulomb_constant * forces
+
+def _bspline(x, order):
+    #Cardinal B-spline M_order(x), supported on [0, order].
+    if order == 2:
+        return np.clip(1.0 - np.abs(x - 1.0), 0.0, None)
+    return (x * _bspline(x, order - 1) + (order - x) * _bspline(x - 1.0, order - 1)) / (order - 1)
+
+def _bspline_moduli(size, order):
+    #|b(m)|^2 Euler exponential spline factors for one grid axis.
+    m = np.arange(size)
+    knots = _bspline(np.arange(1, order, dtype=np.float64), order)
+    phase = np.exp(2j * math.pi * np.outer(m, np.arange(order - 1)) / size)
+    denominator = np.abs(phase @ knots) ** 2
+    moduli = np.zeros(size)
+    valid = denominator > 1e-10
+    moduli[valid] = 1.0 / denominator[valid]
+    return moduli
+
+def _aliasing(m, size, order):
+    #Relative power of the nearest B-spline aliases of mode m on a grid axis of `size` points,
+    #for forces from differentiated splines (one order lower); modes past Nyquist are lost entirely.
+    m = m.astype(np.float64)
+    aliases = sum((m / (m + j * size)) ** (2 * (order - 1)) for j in (-2, -1, 1, 2))
+    return np.where(np.abs(m) >= 0.5 * size, 1.0, aliases)
+
+def mesh_error(alpha, box, grid, order, tolerance):
+    #Estimated RMS error of the mesh reciprocal forces relative to the reciprocal forces, from the
+    #B-spline aliasing of every mode |m| up to reciprocal_extent(alpha, tolerance).
+    return _mesh_error(_force_spectrum(alpha, box, tolerance), grid, order)
+
+def _force_spectrum(alpha, box, tolerance):
+    #Mode numbers along each axis and the force power (w(m) |k|)^2 summed over the other two axes.
+    extent = reciprocal_extent(alpha, tolerance)
+    axes = [np.arange(-int(math.ceil(extent * length)), int(math.ceil(extent * length)) + 1) for length in box]
+    k2 = ((axes[0] / box[0])[:, None, None] ** 2 + (axes[1] / box[1])[None, :, None] ** 2
+          + (axes[2] / box[2])[None, None, :] ** 2)
+    k2[k2 == 0] = np.inf
+    power = np.exp(-2.0 * math.pi * math.pi * k2 / (alpha * alpha)) / k2
+    marginals = [power.sum(axis=(1, 2)), power.sum(axis=(0, 2)), power.sum(axis=(0, 1))]
+    return axes, marginals, float(power.sum())
+
+def _mesh_error(spectrum, grid, order):
+    #Aliasing separates by axis, so the 3-D sum reduces to one sum per axis.
+    axes, marginals, total = spectrum
+    #Spreading and interpolation each alias, hence the factor 2
+    error = sum(np.dot(marginal, _aliasing(m, size, order)) for m, marginal, size in zip(axes, marginals, grid))
+    return math.sqrt(2.0 * error / total)
+
+def mesh_grid(alpha, box, order, tolerance):
+    #Smallest FFT-friendly grid (scaled uniformly from the Nyquist size) whose estimated force
+    #error, with _MESH_ERROR_MARGIN, is within `tolerance`.
+    extent = reciprocal_extent(alpha, tolerance)
+    spectrum = _force_spectrum(alpha, box, tolerance)
+    scale = 1.0
+    while True:
+        grid = [_fft_friendly(scale * 2.0 * extent * length) for length in box]
+        if _MESH_ERROR_MARGIN * _mesh_error(spectrum, grid, order) <= tolerance:
+            return grid
+        scale *= 1.1
+
+class ParticleMeshEwald:
+    #Smooth particle-mesh Ewald solver (Essmann et al. 1995) for periodic Coulomb sums.
+    #The reciprocal sum is spread onto a mesh with B-splines and evaluated with NumPy FFTs,
+    #so the long-range cost is O(N log N) instead of a sum over image copies.
+
+    def __init__(self, box, cutoff, tolerance=1e-5, order=6, grid=None, coulomb_constant=1.0):
+        #box: edge lengths; cutoff: real-space cutoff (at most half the shortest edge);
+        #tolerance: relative accuracy target; it sets the splitting parameter (real-space truncation)
+        #and, unless `grid` is given, the mesh size from the B-spline error estimate for `order`.
+        self.box = np.asarray(box, dtype=np.float64).reshape(3)
+        if cutoff > 0.5 * np.min(self.box):
+            raise ValueError("Real-space cutoff must not exceed half the box length")
+        self.cutoff = float(cutoff)
+        self.tolerance = float(tolerance)
+        self.order = int(order)
+        self.coulomb_constant = coulomb_constant
+        self.alpha = ewald_alpha(self.cutoff, self.tolerance)
+
+        if grid is None:
+            grid = mesh_grid(self.alpha, self.box, self.order, self.tolerance)
+        self.grid = np.array(grid, dtype=np.int64).reshape(3)
+        self._influence = self._build_influence()
+
+    @staticmethod
+    def from_settings(settings):
+        #Build a solver for the settings' periodic box.
+        box = box_lengths(settings)
+        cutoff = getattr(settings, 'EWALD_CUTOFF', 0.5 * float(np.min(box)))
+        return ParticleMeshEwald(
+            box,
+            min(cutoff, 0.5 * float(np.min(box))),
+            tolerance=getattr(settings, 'EWALD_TOLERANCE', 1e-5),
+            order=getattr(settings, 'PME_ORDER', 6),
+            coulomb_constant=settings.COULOMB_CONSTANT
+        )
+
+    def _build_influence(self):
+        #Precompute the reciprocal-space influence function G(m) * N_grid for the mesh convolution.
+        kx, ky, kz = self.grid
+        axes = [np.fft.fftfreq(size, d=1.0 / size) / length for size, length in zip(self.grid, self.box)]
+        m2 = axes[0][:, None, None] ** 2 + axes[1][None, :, None] ** 2 + axes[2][None, None, :] ** 2
+        m2[0, 0, 0] = 1.0
+        volume = float(np.prod(self.box))
+        influence = np.exp(-math.pi * math.pi * m2 / (self.alpha * self.alpha)) / m2
+        influence[0, 0, 0] = 0.0
+
+        moduli = [_bspline_moduli(size, self.order) for size in self.grid]
+        influence *= moduli[0][:, None, None] * moduli[1][None, :, None] * moduli[2][None, None, :]
+        return influence * (kx * ky * kz) / (math.pi * volume)
+
+    def _spline_weights(self, positions):
+        #Grid indices, spline weights and derivatives for every particle along each axis.
+        scaled = positions / self.box * self.grid
+        scaled = np.mod(scaled, self.grid)
+        base = np.floor(scaled).astype(np.int64)
+        frac = scaled - base
+        offsets = np.arange(self.order)
+
+        indices, weights, derivatives = [], [], []
+        for axis in range(3):
+            x = frac[:, axis][:, None] + offsets[None, :]
+            indices.append(np.mod(base[:, axis][:, None] - offsets[None, :], self.grid[axis]))
+            weights.append(_bspline(x, self.order))
+            derivatives.append(_bspline(x, self.order - 1) - _bspline(x - 1.0, self.order - 1))
+        return indices, weights, derivatives
+
+    def reciprocal(self, positions, charges):
+        #Mesh reciprocal-space energy and forces (without the Coulomb constant).
+        positions = np.asarray(positions, dtype=np.float64)
+        charges = np.asarray(charges, dtype=np.float64)
+        count = len(positions)
+        if count == 0:
+            return 0.0, np.zeros((0, 3))
+        (ix, iy, iz), (wx, wy, wz), (dx, dy, dz) = self._spline_weights(positions)
+        kx, ky, kz = self.grid
+
+        flat = (ix[:, :, None, None] * ky + iy[:, None, :, None]) * kz + iz[:, None, None, :]
+        spread = charges[:, None, None, None] * wx[:, :, None, None] * wy[:, None, :, None] * wz[:, None, None, :]
+        mesh = np.bincount(flat.ravel(), weights=spread.ravel(), minlength=kx * ky * kz).reshape(kx, ky, kz)
+
+        potential = np.fft.ifftn(np.fft.fftn(mesh) * self._influence).real
+        energy = 0.5 * float(np.sum(mesh * potential))
+
+        local = potential.ravel()[flat]
+        scale = self.grid / self.box
+        forces = np.empty((count, 3))
+        forces[:, 0] = np.einsum('nabc,na,nb,nc->n', local, dx, wy, wz) * scale[0]
+        forces[:, 1] = np.einsum('nabc,na,nb,nc->n', local, wx, dy, wz) * scale[1]
+        forces[:, 2] = np.einsum('nabc,na,nb,nc->n', local, wx, wy, dz) * scale[2]
+        forces *= -charges[:, None]
+        return energy, forces
+
+    def compute(self, positions, charges, pairs=None):
+        #Total periodic Coulomb energy and per-particle forces.
+        #`pairs` optionally restricts the real-space sum to precomputed candidate pairs.
+        positions = np.asarray(positions, dtype=np.float64)
+        charges = np.asarray(charges, dtype=np.float64)
+        energy, forces = real_space(positions, charges, self.box, self.alpha, self.cutoff, pairs)
+        reciprocal_energy, reciprocal_forces = self.reciprocal(positions, charges)
+        energy += reciprocal_energy + self_and_background(charges, self.box, self.alpha)
+        forces += reciprocal_forces
+        return self.coulomb_constant * energy, self.coulomb_constant * forces
+
+    def validate(self, positions, charges, kmax=None):
+        #Compare against the direct Ewald sum with the same splitting parameter.
+        #Returns (relative energy error, RMS force error relative to RMS force).
+        if kmax is None:
+            kmax = int(math.ceil(reciprocal_extent(self.alpha, self.tolerance) * np.max(self.box))) + 1
+        energy, forces = self.compute(positions, charges)
+        ref_energy, ref_forces = direct_ewald(positions, charges, self.box, self.alpha, self.cutoff, kmax, self.coulomb_constant)
+        energy_error = abs(energy - ref_energy) / max(abs(ref_energy), 1e-300)
+        force_scale = math.sqrt(np.mean(ref_forces ** 2))
+        if force_scale < 1e-9:
+            force_scale = 1.0  #symmetric configurations have vanishing reference forces
+        force_error = math.sqrt(np.mean((forces - ref_forces) ** 2)) / force_scale
+        return energy_error, force_error
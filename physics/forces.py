@@ -0,0 +1,53 @@
+import numpy as np
+
+class LennardJones:
+    #12-6 Lennard-Jones pair potential for van der Waals style interactions.
+
+    def __init__(self, epsilon=1.0, sigma=1.0):
+        self.epsilon = epsilon
+        self.sigma = sigma
+
+    def __call__(self, r2):
+        #Pair energies and -dU/dr / r for squared separations r2.
+        inv6 = (self.sigma * self.sigma / r2) ** 3
+        energy = 4.0 * self.epsilon * (inv6 * inv6 - inv6)
+        force_over_r = 24.0 * self.epsilon * (2.0 * inv6 * inv6 - inv6) / r2
+        return energy, force_over_r
+
+class Morse:
+    #Morse pair potential for bonded interactions: U = D (1 - exp(-a (r - r0)))^2 - D.
+
+    def __init__(self, depth=1.0, width=1.0, equilibrium=1.0):
+        self.depth = depth
+        self.width = width
+        self.equilibrium = equilibrium
+
+    def __call__(self, r2):
+        #Pair energies and -dU/dr / r for squared separations r2.
+        r = np.sqrt(r2)
+        decay = np.exp(-self.width * (r - self.equilibrium))
+        energy = self.depth * (1.0 - decay) ** 2 - self.depth
+        force_over_r = -2.0 * self.depth * self.width * decay * (1.0 - decay) / r
+        return energy, force_over_r
+
+def pair_forces(count, i, j, delta, potential):
+    #Total energy and per-particle forces from a pair potential, evaluated in one vectorized pass.
+    #`delta` holds positions[i] - positions[j] (minimum image already applied for periodic boxes).
+    forces = np.zeros((count, 3))
+    if len(i) == 0:
+        return 0.0, forces
+    r2 = np.einsum('ij,ij->i', delta, delta)
+    energy, force_over_r = potential(r2)
+    pair_force = delta * force_over_r[:, None]
+    for axis in range(3):
+        forces[:, axis] += np.bincount(i, weights=pair_force[:, axis], minlength=count)
+        forces[:, axis] -= np.bincount(j, weights=pair_force[:, axis], minlength=count)
+    return float(np.sum(energy)), forces
+
+def assign_bonds(atoms, i, j):
+    #Replace every atom's bond list with the partners given by pair indices (i, j).
+    for atom in atoms:
+        atom.bonds = []
+    for first, second in zip(i.tolist(), j.tolist()):
+        atoms[first].bonds.append(atoms[second])
+        atoms[second].bonds.append(atoms[first])
@@ -0,0 +1,189 @@
+import bisect
+from collections import deque
+import numpy as np
+
+def capture_state(atoms):
+    #Arrays describing the dynamic state of every atom and electron, plus the layout they belong to.
+    electrons = [electron for atom in atoms for electron in atom.electrons]
+    arrays = {
+        "atom_positions": np.array([atom.position for atom in atoms], dtype=np.float32).reshape(-1, 3),
+        "atom_velocities": np.array([atom.velocity for atom in atoms], dtype=np.float32).reshape(-1, 3),
+        "electron_positions": np.array([electron.position for electron in electrons], dtype=np.float32).reshape(-1, 3),
+        "electron_velocities": np.array([electron.velocity for electron in electrons], dtype=np.float32).reshape(-1, 3),
+    }
+    layout = tuple((id(atom), len(atom.electrons), atom.atomic_number) for atom in atoms)
+    return arrays, layout
+
+def capture_composition(atoms):
+    #Each atom's nucleus and electron lists, so a restore can undo decays, captures and ionization.
+    return [(atom.atomic_number, atom.mass_number, list(atom.protons), list(atom.neutrons), list(atom.electrons))
+            for atom in atoms]
+
+def apply_composition(atoms, composition):
+    #Give every atom back the particles it had when `composition` was captured.
+    for atom, (atomic_number, mass_number, protons, neutrons, electrons) in zip(atoms, composition):
+        if (atom.atomic_number == atomic_number and atom.mass_number == mass_number
+                and atom.protons == protons and atom.neutrons == neutrons and atom.electrons == electrons):
+            continue
+        atom.atomic_number = atomic_number
+        atom.mass_number = mass_number
+        atom.protons = list(protons)
+        atom.neutrons = list(neutrons)
+        atom.electrons = list(electrons)
+        atom._nucleon_offsets = None
+        atom.update_element_info()
+        atom.update_nucleus_radius()
+
+def apply_state(atoms, arrays):
+    #Write captured arrays back into the atoms and their electrons.
+    electrons = [electron for atom in atoms for electron in atom.electrons]
+    if len(atoms) != len(arrays["atom_positions"]) or len(electrons) != len(arrays["electron_positions"]):
+        raise ValueError("Captured state does not match the atoms' composition")
+    for atom, position, velocity in zip(atoms, arrays["atom_positions"], arrays["atom_velocities"]):
+        atom.position = position.copy()
+        atom.velocity = velocity.copy()
+    for electron, position, velocity in zip(electrons, arrays["electron_positions"], arrays["electron_velocities"]):
+        electron.position = position.copy()
+        electron.velocity = velocity.copy()
+        electron.orbital_path = []
+        electron.acceleration = np.zeros(3, dtype=np.float32)
+    for atom in atoms:
+        atom.refit_orbits()
+
+def _nbytes(arrays):
+    return sum(array.nbytes for array in arrays.values())
+
+def _change_bytes(changes):
+    return sum(values.nbytes + (0 if rows is None else rows.nbytes) for rows, values in changes.values())
+
+class RewindHistory:
+    #Bounded in-memory history for scrubbing back through a run.
+    #Every `keyframe_interval` steps (or when atoms are added, removed or change composition) a full
+    #keyframe is stored, including each atom's particle lists so composition changes can be undone;
+    #the steps in between keep only the rows of each array that changed since the previous step
+    #(or the whole array, without row indices, when that is smaller), and arrays that did not change
+    #at all cost nothing.  Once the total size exceeds `memory_budget` bytes the oldest keyframe is
+    #evicted together with its deltas.
+
+    def __init__(self, memory_budget=64 * 1024 * 1024, keyframe_interval=30):
+        self.memory_budget = memory_budget
+        self.keyframe_interval = keyframe_interval
+        self.groups = deque()
+        self.total_bytes = 0
+        self._last_arrays = None
+        self._last_layout = None
+        #Step last restored by restore(); the next record() continues the run from there
+        self.cursor = None
+
+    def __len__(self):
+        return sum(1 + len(group["deltas"]) for group in self.groups)
+
+    @property
+    def first_step(self):
+        return self.groups[0]["step"] if self.groups else None
+
+    @property
+    def last_step(self):
+        if not self.groups:
+            return None
+        deltas = self.groups[-1]["deltas"]
+        return deltas[-1]["step"] if deltas else self.groups[-1]["step"]
+
+    def record(self, step, sim_time, atoms):
+        #Store the state after `step`; recording after a rewind discards the abandoned future,
+        #whatever step number the caller continues with.
+        if self.cursor is not None:
+            self.truncate_after(self.cursor)
+            self.cursor = None
+        if self.groups and step <= self.last_step:
+            self.truncate_after(step - 1)
+        arrays, layout = capture_state(atoms)
+        group = self.groups[-1] if self.groups else None
+
+        if (group is None or layout != self._last_layout
+                or step - group["step"] >= self.keyframe_interval):
+            group = {"step": step, "time": sim_time, "atoms": list(atoms), "arrays": arrays,
+                     "composition": capture_composition(atoms), "layout": layout,
+                     "deltas": [], "bytes": _nbytes(arrays)}
+            self.groups.append(group)
+            self.total_bytes += group["bytes"]
+        else:
+            changes = {}
+            for name, array in arrays.items():
+                previous = self._last_arrays[name]
+                rows = np.nonzero(np.any(array != previous, axis=1))[0].astype(np.int32)
+                if not len(rows):
+                    continue
+                if rows.nbytes + len(rows) * array.itemsize * array.shape[1] < array.nbytes:
+                    changes[name] = (rows, array[rows])
+                else:
+                    changes[name] = (None, array)  #most rows moved; the indices would cost more
+            size = _change_bytes(changes)
+            group["deltas"].append({"step": step, "time": sim_time, "changes": changes})
+            group["bytes"] += size
+            self.total_bytes += size
+
+        self._last_arrays = arrays
+        self._last_layout = layout
+        while self.total_bytes > self.memory_budget and len(self.groups) > 1:
+            self.total_bytes -= self.groups.popleft()["bytes"]
+
+    def truncate_after(self, step):
+        #Forget every entry after `step`.
+        while self.groups and self.groups[-1]["step"] > step:
+            self.total_bytes -= self.groups.pop()["bytes"]
+        if self.groups:
+            group = self.groups[-1]
+            kept = [delta for delta in group["deltas"] if delta["step"] <= step]
+            for delta in group["deltas"][len(kept):]:
+                size = _change_bytes(delta["changes"])
+                group["bytes"] -= size
+                self.total_bytes -= size
+            group["deltas"] = kept
+        if self.groups:
+            self._last_arrays, _ = self._reconstruct(self.groups[-1], self.last_step)
+            self._last_layout = self.groups[-1]["layout"]
+        else:
+            self._last_arrays = None
+            self._last_layout = None
+
+    def _reconstruct(self, group, step):
+        arrays = {name: array.copy() for name, array in group["arrays"].items()}
+        sim_time = group["time"]
+        for delta in group["deltas"]:
+            if delta["step"] > step:
+                break
+            for name, (rows, values) in delta["changes"].items():
+                if rows is None:
+                    arrays[name][:] = values
+                else:
+                    arrays[name][rows] = values
+            sim_time = delta["time"]
+        return arrays, sim_time
+
+    def step_at_fraction(self, fraction):
+        #Retained step closest to a 0..1 position along the history (for a scrub slider).
+        if not self.groups:
+            return None
+        fraction = min(max(fraction, 0.0), 1.0)
+        return int(round(self.first_step + fraction * (self.last_step - self.first_step)))
+
+    def restore(self, step, atoms):
+        #Rewind `atoms` (the engine's atom list, modified in place) to the retained step at or before
+        #`step`, replaying deltas from the nearest keyframe.  Returns (step, simulation time).
+        if not self.groups:
+            return None, None
+        step = min(max(step, self.first_step), self.last_step)
+        keys = [group["step"] for group in self.groups]
+        group = self.groups[bisect.bisect_right(keys, step) - 1]
+        arrays, sim_time = self._reconstruct(group, step)
+        atoms[:] = group["atoms"]
+        apply_composition(atoms, group["composition"])
+        apply_state(atoms, arrays)
+        restored = group["step"]
+        for delta in group["deltas"]:
+            if delta["step"] > step:
+                break
+            restored = delta["step"]
+        self.cursor = restored
+        return restored, sim_time
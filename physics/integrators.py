@@ -0,0 +1,177 @@
+import time
+import numpy as np
+from physics.forces import pair_forces
+from physics.utils import is_periodic
+
+def pair_force_field(potential, neighbor_list):
+    #Slow force callable for MultipleTimeStepIntegrator: positions -> (energy, forces) from a pair
+    #potential over the pairs of a VerletNeighborList.
+    def slow_forces(positions):
+        i, j, delta = neighbor_list.pairs_within_cutoff(positions)
+        return pair_forces(len(positions), i, j, delta, potential)
+    return slow_forces
+
+def gather_state(atoms):
+    #Float64 arrays for the atom centres and the force-integrated electrons of `atoms`.
+    #Atoms on analytic orbits contribute their centre but not their electrons.
+    electrons, owners, coefficients = [], [], []
+    for index, atom in enumerate(atoms):
+        if atom.analytic_orbits or not atom.electrons:
+            continue
+        electrons.extend(atom.electrons)
+        owners.extend([index] * len(atom.electrons))
+        coefficients.append(atom.electron_force_coefficients())
+    return {
+        "positions": np.array([atom.position for atom in atoms], dtype=np.float64).reshape(-1, 3),
+        "velocities": np.array([atom.velocity for atom in atoms], dtype=np.float64).reshape(-1, 3),
+        "masses": np.array([atom.mass_number for atom in atoms], dtype=np.float64),
+        "electrons": electrons,
+        "electron_positions": np.array([electron.position for electron in electrons], dtype=np.float64).reshape(-1, 3),
+        "electron_velocities": np.array([electron.velocity for electron in electrons], dtype=np.float64).reshape(-1, 3),
+        "electron_masses": np.array([electron.mass for electron in electrons], dtype=np.float64),
+        "owners": np.array(owners, dtype=np.int64),
+        "coefficients": np.concatenate(coefficients) if coefficients else np.zeros(0),
+    }
+
+def copy_state(state):
+    return {name: value.copy() if isinstance(value, np.ndarray) else value for name, value in state.items()}
+
+def electron_accelerations(state):
+    #Accelerations of the electrons from their own nucleus (the fast forces).
+    offsets = state["electron_positions"] - state["positions"][state["owners"]]
+    distance = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+    masses = state["electron_masses"]
+    scale = np.divide(state["coefficients"], distance ** 3 * masses,
+                      out=np.zeros_like(distance), where=(distance > 0) & (masses > 0))
+    return offsets * scale[:, None]
+
+def electron_energy(state):
+    #Kinetic energy of the electrons plus their potential energy in the nuclear field.
+    offsets = state["electron_positions"] - state["positions"][state["owners"]]
+    distance = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+    velocities = state["electron_velocities"]
+    kinetic = 0.5 * state["electron_masses"] @ np.einsum('ij,ij->i', velocities, velocities)
+    potential = np.divide(state["coefficients"], distance, out=np.zeros_like(distance), where=distance > 0)
+    return float(kinetic + potential.sum())
+
+def total_energy(state, slow_forces):
+    #Conserved energy of a state: atom kinetic + slow potential + electron energy.
+    velocities = state["velocities"]
+    kinetic = 0.5 * state["masses"] @ np.einsum('ij,ij->i', velocities, velocities)
+    slow_energy = slow_forces(state["positions"])[0] if slow_forces is not None and len(velocities) else 0.0
+    return float(kinetic) + float(slow_energy) + electron_energy(state)
+
+class MultipleTimeStepIntegrator:
+    #r-RESPA multiple-time-step integrator for atoms and their electrons.
+    #Each outer step of length dt half-kicks the atom centres with the slow inter-atomic forces,
+    #then runs `substeps` velocity Verlet substeps of dt / substeps in which the centres drift and
+    #the electrons move under the fast nuclear Coulomb force, and finally half-kicks again with the
+    #slow forces at the new positions.  Slow forces are evaluated once per outer step (the end-of-step
+    #evaluation is reused for the next step's first half-kick) instead of once per electron substep.
+    #`slow_forces` maps atom-centre positions to (energy, forces), e.g. pair_force_field(); None means
+    #the centres only drift, as in Atom.update.
+
+    def __init__(self, settings, slow_forces=None, substeps=None, fluctuation=True):
+        self.settings = settings
+        self.slow_forces = slow_forces
+        self.substeps = max(1, int(substeps if substeps is not None else getattr(settings, 'RESPA_SUBSTEPS', 4)))
+        self.fluctuation = fluctuation
+        self.slow_energy = 0.0
+        self.slow_evaluations = 0
+        self._cached = None
+
+    def _slow_accelerations(self, state):
+        #Slow accelerations of the atom centres, reusing the previous step's evaluation if the
+        #centres have not been moved (or atoms added/removed) since.
+        positions = state["positions"]
+        if self._cached is not None and np.array_equal(self._cached[0], positions):
+            return self._cached[1]
+        if self.slow_forces is None or not len(positions):
+            accelerations = np.zeros_like(positions)
+        else:
+            self.slow_energy, forces = self.slow_forces(positions)
+            self.slow_evaluations += 1
+            accelerations = forces / state["masses"][:, None]
+        self._cached = (positions.copy(), accelerations)
+        return accelerations
+
+    def advance(self, state, dt, rng=None):
+        #Advance a gather_state() dictionary by one outer step in place.
+        velocities = state["velocities"]
+        velocities += 0.5 * dt * self._slow_accelerations(state)
+
+        h = dt / self.substeps
+        sigma = getattr(self.settings, 'QUANTUM_FLUCTUATION', 0.0) if self.fluctuation else 0.0
+        fast = electron_accelerations(state)
+        for _ in range(self.substeps):
+            state["electron_velocities"] += 0.5 * h * fast
+            state["electron_positions"] += h * state["electron_velocities"]
+            state["positions"] += h * velocities
+            fast = electron_accelerations(state)
+            state["electron_velocities"] += 0.5 * h * fast
+            if sigma > 0 and len(fast):
+                #Random force standing in for quantum effects, as in Atom.update_electrons
+                noise = (rng if rng is not None else np.random).normal(0, sigma, fast.shape)
+                masses = state["electron_masses"][:, None]
+                state["electron_velocities"] += h * np.divide(noise, masses, out=np.zeros_like(noise), where=masses > 0)
+
+        velocities += 0.5 * dt * self._slow_accelerations(state)
+        return state
+
+    def step(self, atoms, dt):
+        #Advance the atoms and their electrons by one outer step of length dt.
+        if not atoms:
+            return
+        state = gather_state(atoms)
+        self.advance(state, dt)
+
+        for atom, position, velocity in zip(atoms, state["positions"], state["velocities"]):
+            atom.position = position.astype(np.float32)
+            atom.velocity = velocity.astype(np.float32)
+        for electron, position, velocity in zip(state["electrons"], state["electron_positions"], state["electron_velocities"]):
+            electron.position = position.astype(np.float32)
+            electron.velocity = velocity.astype(np.float32)
+            electron.orbital_path.append(electron.position.copy())
+            if len(electron.orbital_path) > electron.max_path_points:
+                electron.orbital_path.pop(0)
+        for atom in atoms:
+            if atom.analytic_orbits:
+                atom.update_electrons(dt)
+            if is_periodic(self.settings):
+                atom.wrap_into_box()
+        #Keep the cached slow forces valid for the stored (float32) positions
+        if self._cached is not None:
+            self._cached = (state["positions"].astype(np.float32).astype(np.float64), self._cached[1])
+
+def validate_multiple_time_step(atoms, settings, slow_forces, dt, steps, substeps=None):
+    #Run the atoms' current state (without modifying them) with the multiple-time-step integrator
+    #and with a single-rate velocity Verlet reference at the inner step dt / substeps, both without
+    #quantum fluctuations, and report energy drift, trajectory deviation and cost.
+    start = gather_state(atoms)
+    respa = MultipleTimeStepIntegrator(settings, slow_forces, substeps, fluctuation=False)
+    reference = MultipleTimeStepIntegrator(settings, slow_forces, 1, fluctuation=False)
+    initial_energy = total_energy(start, slow_forces)
+    scale = max(abs(initial_energy), 1e-12)
+
+    results = {"substeps": respa.substeps, "initial_energy": initial_energy}
+    runs = (("respa", respa, dt, steps), ("reference", reference, dt / respa.substeps, steps * respa.substeps))
+    for name, integrator, step_dt, step_count in runs:
+        state = copy_state(start)
+        energies = np.empty(step_count + 1)
+        energies[0] = initial_energy
+        started = time.perf_counter()
+        for index in range(step_count):
+            integrator.advance(state, step_dt)
+            energies[index + 1] = total_energy(state, slow_forces)
+        results[name] = {
+            "state": state,
+            "seconds": time.perf_counter() - started,
+            "slow_evaluations": integrator.slow_evaluations,
+            "energy_drift": float(energies[-1] - initial_energy) / scale,
+            "max_energy_error": float(np.max(np.abs(energies - initial_energy))) / scale,
+        }
+
+    respa_state, reference_state = results["respa"]["state"], results["reference"]["state"]
+    results["max_atom_deviation"] = float(np.max(np.linalg.norm(respa_state["positions"] - reference_state["positions"], axis=1), initial=0.0))
+    results["max_electron_deviation"] = float(np.max(np.linalg.norm(respa_state["electron_positions"] - reference_state["electron_positions"], axis=1), initial=0.0))
+    return results
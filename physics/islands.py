@@ -0,0 +1,225 @@
+import numpy as np
+from physics.utils import pairs_within, box_lengths, is_periodic, minimum_image, wrap_positions
+
+def bond_pairs(atoms):
+    #Index pairs (i, j) for every bond between atoms in the list.
+    index = {id(atom): i for i, atom in enumerate(atoms)}
+    first, second = [], []
+    for i, atom in enumerate(atoms):
+        for partner in atom.bonds:
+            j = index.get(id(partner))
+            if j is not None and i < j:
+                first.append(i)
+                second.append(j)
+    return np.array(first, dtype=np.int64), np.array(second, dtype=np.int64)
+
+def connected_labels(count, pairs):
+    #Connected-component label of each node, given edge index arrays.
+    #Vectorized label propagation with pointer jumping; labels are the smallest index in each component.
+    labels = np.arange(count)
+    i, j = pairs
+    if len(i) == 0:
+        return labels
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        updated = labels.copy()
+        np.minimum.at(updated, i, low)
+        np.minimum.at(updated, j, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+#Neighbouring cell offsets for contact queries against the sleeping-atom grid
+_CELL_OFFSETS = np.stack(np.meshgrid(*[np.arange(-1, 2)] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+_KEY_BITS = 20
+
+class IslandScheduler:
+    #Groups atoms into interaction islands and puts idle islands to sleep.
+    #Atoms are linked into an island by bonds or by being within ISLAND_CONTACT_DISTANCE.
+    #An island whose atoms all stay below SLEEP_VELOCITY_THRESHOLD for SLEEP_DELAY seconds
+    #goes to sleep and is skipped by step(); it wakes when an awake atom joins its island
+    #(contact) or when one of its atoms is woken explicitly (Atom.wake, e.g. on an impulse).
+    #Sleeping atoms do not move, so their island labels are cached and only awake atoms are
+    #searched for contacts (against each other, and against a cell grid of the sleeping atoms that
+    #is rebuilt only when atoms fall asleep).  Per-step work beyond one pass over the sleeping
+    #flags therefore scales with the number of awake atoms.
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.contact_distance = getattr(settings, 'ISLAND_CONTACT_DISTANCE', 2.0)
+        self.sleep_velocity = getattr(settings, 'SLEEP_VELOCITY_THRESHOLD', 1e-3)
+        self.sleep_delay = getattr(settings, 'SLEEP_DELAY', 0.5)
+
+        self.labels = np.zeros(0, dtype=np.int64)
+        self.active_count = 0
+        self.sleeping_count = 0
+
+        #Per-atom caches, valid while the atom list is unchanged
+        self._atom_ids = None
+        self._index = {}
+        self._positions = np.zeros((0, 3))
+        self._timers = np.zeros(0)
+        self._sleeping = np.zeros(0, dtype=bool)
+        self._grid = None
+
+    @property
+    def island_count(self):
+        return int(len(np.unique(self.labels)))
+
+    def _box(self):
+        return box_lengths(self.settings) if is_periodic(self.settings) else None
+
+    def build_islands(self, atoms):
+        #Label every atom with its island.
+        positions = np.array([atom.position for atom in atoms], dtype=np.float64).reshape(-1, 3)
+        contact_i, contact_j = pairs_within(positions, self.contact_distance, self._box())
+        bond_i, bond_j = bond_pairs(atoms)
+        pairs = (np.concatenate((contact_i, bond_i)), np.concatenate((contact_j, bond_j)))
+        self.labels = connected_labels(len(atoms), pairs)
+        return self.labels
+
+    def _cell_keys(self, coords):
+        #Pack integer cell coordinates into sortable int64 keys.
+        coords = coords + (1 << (_KEY_BITS - 1))
+        return (coords[..., 0] << (2 * _KEY_BITS)) | (coords[..., 1] << _KEY_BITS) | coords[..., 2]
+
+    def _cell_coords(self, positions):
+        box = self._box()
+        if box is None:
+            return np.floor(positions / self.contact_distance).astype(np.int64), None
+        cells = np.maximum(np.floor(box / self.contact_distance).astype(np.int64), 1)
+        coords = np.floor((wrap_positions(positions, box) + 0.5 * box) / (box / cells)).astype(np.int64) % cells
+        return coords, cells
+
+    def _build_sleep_grid(self):
+        #Sorted cell keys of the sleeping atoms, for contact queries from awake atoms.
+        members = np.nonzero(self._sleeping)[0]
+        coords, _ = self._cell_coords(self._positions[members])
+        keys = self._cell_keys(coords)
+        order = np.argsort(keys, kind='stable')
+        self._grid = (keys[order], members[order])
+
+    def _sleeping_contacts(self, awake):
+        #Pairs (awake atom, sleeping atom) closer than the contact distance.
+        empty = np.zeros(0, dtype=np.int64)
+        if self._grid is None or not len(self._grid[1]) or not len(awake):
+            return empty, empty
+        grid_keys, grid_members = self._grid
+        coords, cells = self._cell_coords(self._positions[awake])
+        neighbors = coords[:, None, :] + _CELL_OFFSETS[None, :, :]
+        if cells is not None:
+            neighbors %= cells
+        keys = self._cell_keys(neighbors).reshape(-1)
+        sources = np.repeat(awake, len(_CELL_OFFSETS))
+        low = np.searchsorted(grid_keys, keys, 'left')
+        counts = np.searchsorted(grid_keys, keys, 'right') - low
+        total = int(counts.sum())
+        if total == 0:
+            return empty, empty
+        starts = np.repeat(low - np.cumsum(counts) + counts, counts)
+        first = np.repeat(sources, counts)
+        second = grid_members[starts + np.arange(total)]
+
+        delta = self._positions[first] - self._positions[second]
+        box = self._box()
+        if box is not None:
+            delta = minimum_image(delta, box)
+        keep = self._sleeping[second] & (np.einsum('ij,ij->i', delta, delta) < self.contact_distance ** 2)
+        return first[keep], second[keep]
+
+    def _bonds(self, atoms, indices):
+        #Bonds of the given atoms as global index pairs.
+        first, second = [], []
+        for i in indices.tolist():
+            for partner in atoms[i].bonds:
+                j = self._index.get(id(partner))
+                if j is not None:
+                    first.append(i)
+                    second.append(j)
+        return np.array(first, dtype=np.int64), np.array(second, dtype=np.int64)
+
+    def _reset(self, atoms, flags):
+        #Rebuild every cache after atoms were added or removed.
+        self._atom_ids = [id(atom) for atom in atoms]
+        self._index = {atom_id: i for i, atom_id in enumerate(self._atom_ids)}
+        self._positions = np.array([atom.position for atom in atoms], dtype=np.float64).reshape(-1, 3)
+        self._timers = np.array([atom.sleep_timer for atom in atoms], dtype=np.float64)
+        self._sleeping = flags.copy()
+        self.build_islands(atoms)
+        self._build_sleep_grid()
+
+    def update_sleep_states(self, atoms, dt):
+        #Advance idle timers and put islands to sleep or wake them.
+        count = len(atoms)
+        if count == 0:
+            self.labels = np.zeros(0, dtype=np.int64)
+            self.active_count = self.sleeping_count = 0
+            self._atom_ids = None
+            return
+        flags = np.fromiter((atom.sleeping for atom in atoms), dtype=bool, count=count)
+        if len(self._sleeping) != count or [id(atom) for atom in atoms] != self._atom_ids:
+            self._reset(atoms, flags)
+        else:
+            #Atoms woken from outside (Atom.wake) restart their idle timers
+            woken = self._sleeping & ~flags
+            self._timers[woken] = 0.0
+            self._sleeping &= flags
+
+        awake = np.nonzero(~self._sleeping)[0]
+        if len(awake):
+            self._positions[awake] = np.array([atoms[i].position for i in awake.tolist()], dtype=np.float64)
+
+        #Sleeping islands touched by an awake atom join the awake set for this step
+        bond_first, bond_second = self._bonds(atoms, awake)
+        _, second = self._sleeping_contacts(awake)
+        touched = np.concatenate((second, bond_second[self._sleeping[bond_second]]))
+        if len(touched):
+            joined = np.nonzero(np.isin(self.labels, np.unique(self.labels[touched])) & self._sleeping)[0]
+            joined_first, joined_second = self._bonds(atoms, joined)
+            bond_first = np.concatenate((bond_first, joined_first))
+            bond_second = np.concatenate((bond_second, joined_second))
+            awake = np.union1d(awake, joined)
+        if not len(awake):
+            self.active_count = 0
+            self.sleeping_count = count
+            return
+
+        #Islands among the awake atoms (sleeping atoms never link two awake ones without joining)
+        local = np.full(count, -1, dtype=np.int64)
+        local[awake] = np.arange(len(awake))
+        contact_i, contact_j = pairs_within(self._positions[awake], self.contact_distance, self._box())
+        keep = local[bond_second] >= 0
+        pairs = (np.concatenate((contact_i, local[bond_first[keep]])), np.concatenate((contact_j, local[bond_second[keep]])))
+        island = connected_labels(len(awake), pairs)
+        self.labels[awake] = awake[island]
+
+        speeds = np.linalg.norm(np.array([atoms[i].velocity for i in awake.tolist()], dtype=np.float64).reshape(-1, 3), axis=1)
+        island_speed = np.zeros(len(awake))
+        np.maximum.at(island_speed, island, speeds)
+
+        #Idle islands accumulate time; any motion resets the whole island
+        idle = island_speed[island] < self.sleep_velocity
+        timers = np.where(idle, self._timers[awake] + dt, 0.0)
+        island_timer = np.full(len(awake), np.inf)
+        np.minimum.at(island_timer, island, timers)
+        asleep = idle & (island_timer[island] >= self.sleep_delay)
+
+        self._timers[awake] = timers
+        for i, timer, state in zip(awake.tolist(), timers.tolist(), asleep.tolist()):
+            atoms[i].sleep_timer = timer
+            atoms[i].sleeping = state
+        was_sleeping = self._sleeping[awake]
+        self._sleeping[awake] = asleep
+        if np.any(asleep & ~was_sleeping):
+            self._build_sleep_grid()
+        self.sleeping_count = int(np.count_nonzero(self._sleeping))
+        self.active_count = count - self.sleeping_count
+
+    def step(self, atoms, dt):
+        #Update sleep states and advance only the awake atoms; returns the atoms that were stepped.
+        self.update_sleep_states(atoms, dt)
+        active = [atoms[i] for i in np.nonzero(~self._sleeping)[0].tolist()] if len(atoms) else []
+        for atom in active:
+            atom.update(dt)
+        return active
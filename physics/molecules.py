@@ -0,0 +1,126 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from physics.islands import bond_pairs, connected_labels
+
+#Reference molecules as (display formula, name, element symbols, bonds between symbol indices)
+REFERENCE_MOLECULES = [
+    ("H2", "Hydrogen Gas", ["H", "H"], [(0, 1)]),
+    ("O2", "Oxygen Gas", ["O", "O"], [(0, 1)]),
+    ("N2", "Nitrogen Gas", ["N", "N"], [(0, 1)]),
+    ("H2O", "Water", ["O", "H", "H"], [(0, 1), (0, 2)]),
+    ("CH4", "Methane", ["C", "H", "H", "H", "H"], [(0, 1), (0, 2), (0, 3), (0, 4)]),
+    ("NH3", "Ammonia", ["N", "H", "H", "H"], [(0, 1), (0, 2), (0, 3)]),
+    ("CO2", "Carbon Dioxide", ["O", "C", "O"], [(0, 1), (1, 2)]),
+    ("LiH", "Lithium Hydride", ["Li", "H"], [(0, 1)]),
+]
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+def graph_hash(symbols, edges, iterations=3):
+    #Weisfeiler-Lehman hash of an element-labelled graph.
+    #Isomorphic graphs always hash equal; graphs with the same formula but different
+    #connectivity (isomers) almost always differ.
+    labels = list(symbols)
+    neighbors = [[] for _ in symbols]
+    for first, second in edges:
+        neighbors[first].append(second)
+        neighbors[second].append(first)
+
+    history = sorted(labels)
+    for _ in range(iterations):
+        labels = [_digest(label + "(" + ",".join(sorted(labels[j] for j in adjacent)) + ")")
+                  for label, adjacent in zip(labels, neighbors)]
+        history.extend(sorted(labels))
+    return _digest("|".join(history))
+
+def hill_formula(symbols):
+    #Chemical formula in Hill order (C, H, then alphabetical; alphabetical without carbon).
+    counts = {}
+    for symbol in symbols:
+        counts[symbol] = counts.get(symbol, 0) + 1
+    if "C" in counts:
+        order = ["C"] + (["H"] if "H" in counts else []) + sorted(s for s in counts if s not in ("C", "H"))
+    else:
+        order = sorted(counts)
+    return "".join(symbol + (str(counts[symbol]) if counts[symbol] > 1 else "") for symbol in order)
+
+def _hash_color(digest):
+    #Stable pastel colour for molecules without a fixed HUD colour.
+    value = int(digest[:6], 16)
+    return tuple(150 + (value >> shift & 0xFF) * 105 // 255 for shift in (16, 8, 0))
+
+KNOWN_MOLECULES = {
+    graph_hash(symbols, edges): (formula, name)
+    for formula, name, symbols, edges in REFERENCE_MOLECULES
+}
+
+class MoleculeCatalog:
+    #Hash-keyed, size-bounded cache of molecule names and properties.
+    #Each bonded component costs one graph hash and one lookup; naming work is done once per
+    #distinct structure, and least recently used entries are evicted past `max_entries`.
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, symbols, edges):
+        #Properties of the molecule with these element symbols and bonds.
+        key = graph_hash(symbols, edges)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        formula = hill_formula(symbols)
+        known = key in KNOWN_MOLECULES
+        if known:
+            formula, name = KNOWN_MOLECULES[key]
+        else:
+            #Tag with the hash so isomers sharing a formula stay distinguishable
+            name = f"{formula} ({key[:6]})"
+        entry = {"hash": key, "formula": formula, "name": name, "color": _hash_color(key), "size": len(symbols), "known": known}
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+def bonded_components(atoms):
+    #Index lists of every group of two or more atoms connected through Atom.bonds, plus the bond pairs.
+    pairs = bond_pairs(atoms)
+    labels = connected_labels(len(atoms), pairs)
+    order = np.argsort(labels, kind='stable')
+    boundaries = np.nonzero(np.diff(labels[order]))[0] + 1
+    return [group.tolist() for group in np.split(order, boundaries) if len(group) > 1], pairs
+
+def identify_molecules(atoms, catalog):
+    #Name every bonded component, returning dicts with formula, name, hash, colour, center and atoms.
+    components, (bond_i, bond_j) = bonded_components(atoms)
+    if not components:
+        return []
+    labels = np.full(len(atoms), -1)
+    local = np.zeros(len(atoms), dtype=np.int64)
+    for component_index, members in enumerate(components):
+        labels[members] = component_index
+        local[members] = np.arange(len(members))
+    edges = [[] for _ in components]
+    for first, second in zip(bond_i.tolist(), bond_j.tolist()):
+        edges[labels[first]].append((int(local[first]), int(local[second])))
+
+    molecules = []
+    for members, component_edges in zip(components, edges):
+        member_atoms = [atoms[index] for index in members]
+        entry = catalog.lookup([atom.element_symbol for atom in member_atoms], component_edges)
+        molecule = dict(entry)
+        molecule["atoms"] = member_atoms
+        molecule["center"] = np.mean([atom.position for atom in member_atoms], axis=0)
+        molecules.append(molecule)
+    return molecules
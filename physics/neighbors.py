@@ -0,0 +1,63 @@
+import numpy as np
+from physics.utils import pairs_within, minimum_image, box_lengths, is_periodic
+
+class VerletNeighborList:
+    #Verlet neighbor list with a skin distance for short-range pair interactions.
+    #Pairs closer than cutoff + skin are stored and reused across steps; the list is only
+    #rebuilt once some particle has moved more than half the skin since the last build,
+    #which guarantees no pair inside the cutoff can have been missed.
+
+    def __init__(self, cutoff, skin, box=None):
+        self.cutoff = float(cutoff)
+        self.skin = float(skin)
+        self.box = None if box is None else np.asarray(box, dtype=np.float64)
+        self.pairs = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        self.reference_positions = None
+        self.rebuild_count = 0
+
+    @staticmethod
+    def from_settings(settings):
+        #Neighbor list using NEIGHBOR_CUTOFF / NEIGHBOR_SKIN and the periodic box if enabled.
+        box = box_lengths(settings) if is_periodic(settings) else None
+        return VerletNeighborList(
+            getattr(settings, 'NEIGHBOR_CUTOFF', 3.0),
+            getattr(settings, 'NEIGHBOR_SKIN', 0.5),
+            box
+        )
+
+    def needs_rebuild(self, positions):
+        #True when the stored list may be missing pairs for these positions.
+        if self.reference_positions is None or len(self.reference_positions) != len(positions):
+            return True
+        displacement = positions - self.reference_positions
+        if self.box is not None:
+            displacement = minimum_image(displacement, self.box)
+        max_squared = np.max(np.einsum('ij,ij->i', displacement, displacement), initial=0.0)
+        return max_squared > (0.5 * self.skin) ** 2
+
+    def build(self, positions):
+        #Rebuild the list from scratch.
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.pairs = pairs_within(positions, self.cutoff + self.skin, self.box)
+        self.reference_positions = positions.copy()
+        self.rebuild_count += 1
+        return self.pairs
+
+    def update(self, positions):
+        #Candidate pairs for these positions, rebuilding only when required.
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        if self.needs_rebuild(positions):
+            return self.build(positions)
+        return self.pairs
+
+    def pairs_within_cutoff(self, positions, distance=None):
+        #Stored pairs that are currently closer than `distance` (the cutoff by default),
+        #along with their separation vectors.
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        distance = self.cutoff if distance is None else distance
+        i, j = self.update(positions)
+        delta = positions[i] - positions[j]
+        if self.box is not None:
+            delta = minimum_image(delta, self.box)
+        keep = np.einsum('ij,ij->i', delta, delta) < distance * distance
+        return i[keep], j[keep], delta[keep]
@@ -0,0 +1,194 @@
+import csv
+import math
+import os
+import time
+import numpy as np
+from physics.utils import pairs_within, minimum_image, box_lengths, is_periodic, boltzmann_constant
+
+class RunningStatistic:
+    #Online mean and variance (Welford's algorithm) for scalars or fixed-shape arrays.
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        value = np.asarray(value, dtype=np.float64)
+        self.count += 1
+        delta = value - self.mean
+        self.mean = self.mean + delta / self.count
+        self._m2 = self._m2 + delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return 0.0 * self._m2
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+class ObservableSampler:
+    #Running thermodynamic observables, sampled every `interval` steps.
+    #Each sample is a few vectorized reductions over atom arrays: kinetic, potential and total
+    #energy, temperature, momentum drift from the first sample, bond count and a radial
+    #distribution histogram.  Scalars feed Welford accumulators and, optionally, a CSV or NPZ stream.
+    #The RDF needs a pair search and dominates a sample's cost, so it is accumulated only every
+    #`rdf_interval` steps (RDF_INTERVAL, default 10 x interval), reusing the pairs of a Verlet
+    #neighbor list when one with a long enough reach is given.
+
+    FIELDS = ["step", "time", "kinetic", "potential", "total", "temperature", "momentum_drift", "bonds"]
+
+    def __init__(self, settings, interval=10, rdf_bins=64, rdf_range=None, stream_path=None,
+                 rdf_interval=None, neighbor_list=None):
+        self.settings = settings
+        self.interval = max(1, int(interval))
+        if rdf_interval is None:
+            rdf_interval = getattr(settings, 'RDF_INTERVAL', 10 * self.interval)
+        self.rdf_interval = max(1, int(rdf_interval))
+        self.neighbor_list = neighbor_list
+        self.rdf_range = rdf_range if rdf_range is not None else getattr(settings, 'RDF_RANGE', 5.0)
+        self.rdf_edges = np.linspace(0.0, self.rdf_range, rdf_bins + 1)
+        self.rdf_counts = np.zeros(rdf_bins)
+        self.rdf_norm = 0.0
+        self.rdf_samples = 0
+
+        self.statistics = {field: RunningStatistic() for field in self.FIELDS[2:]}
+        self.latest = {}
+        self.initial_momentum = None
+        self.samples = 0
+        self.sample_seconds = 0.0
+        self.rdf_seconds = 0.0
+
+        self.stream_path = stream_path
+        self._csv_file = None
+        self._csv_writer = None
+        self._rows = []
+        if stream_path is not None and not stream_path.endswith(".npz"):
+            self._csv_file = open(stream_path, "w", newline="")
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(self.FIELDS)
+
+    def maybe_sample(self, step, sim_time, atoms, potential_energy=0.0):
+        #Sample on every `interval`-th step; returns the sample or None.
+        if step % self.interval:
+            return None
+        return self.sample(step, sim_time, atoms, potential_energy)
+
+    def sample(self, step, sim_time, atoms, potential_energy=0.0):
+        #Compute all observables for the current state.
+        started = time.perf_counter()
+        count = len(atoms)
+        kb = boltzmann_constant(self.settings)
+        if count:
+            masses = np.array([atom.mass_number for atom in atoms], dtype=np.float64)
+            velocities = np.array([atom.velocity for atom in atoms], dtype=np.float64)
+            positions = np.array([atom.position for atom in atoms], dtype=np.float64)
+        else:
+            masses, velocities, positions = np.zeros(0), np.zeros((0, 3)), np.zeros((0, 3))
+
+        per_atom_kinetic = 0.5 * masses * np.einsum('ij,ij->i', velocities, velocities)
+        kinetic = float(per_atom_kinetic.sum())
+        temperature = 2.0 * kinetic / (3.0 * count * kb) if count else 0.0
+        momentum = masses @ velocities
+        if self.initial_momentum is None:
+            self.initial_momentum = momentum
+        drift = float(np.linalg.norm(momentum - self.initial_momentum))
+        bonds = sum(len(atom.bonds) for atom in atoms) // 2
+
+        for atom, energy in zip(atoms, per_atom_kinetic.tolist()):
+            atom.energy = energy
+            atom.temperature = 2.0 * energy / (3.0 * kb)
+
+        if step % self.rdf_interval == 0:
+            rdf_started = time.perf_counter()
+            self._accumulate_rdf(positions)
+            self.rdf_seconds += time.perf_counter() - rdf_started
+
+        values = {
+            "kinetic": kinetic,
+            "potential": float(potential_energy),
+            "total": kinetic + float(potential_energy),
+            "temperature": temperature,
+            "momentum_drift": drift,
+            "bonds": bonds,
+        }
+        for field, value in values.items():
+            self.statistics[field].update(value)
+        self.latest = dict(values, step=step, time=sim_time)
+        self._stream([self.latest[field] for field in self.FIELDS])
+
+        self.samples += 1
+        self.sample_seconds += time.perf_counter() - started
+        return self.latest
+
+    def _accumulate_rdf(self, positions):
+        #Add one configuration to the radial distribution histogram.
+        count = len(positions)
+        if count < 2:
+            return
+        box = box_lengths(self.settings)
+        periodic_box = box if is_periodic(self.settings) else None
+        neighbors = self.neighbor_list
+        if neighbors is not None and neighbors.cutoff + neighbors.skin >= self.rdf_range:
+            _, _, delta = neighbors.pairs_within_cutoff(positions, self.rdf_range)
+        else:
+            i, j = pairs_within(positions, self.rdf_range, periodic_box)
+            delta = positions[i] - positions[j]
+            if periodic_box is not None:
+                delta = minimum_image(delta, box)
+        distances = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+        self.rdf_counts += np.histogram(distances, bins=self.rdf_edges)[0]
+        #Expected pair count per unit shell volume for an ideal gas at this density
+        self.rdf_norm += 0.5 * count * (count - 1) / float(np.prod(box))
+        self.rdf_samples += 1
+
+    def rdf(self):
+        #Bin centres and averaged g(r).
+        centers = 0.5 * (self.rdf_edges[1:] + self.rdf_edges[:-1])
+        shells = 4.0 / 3.0 * math.pi * (self.rdf_edges[1:] ** 3 - self.rdf_edges[:-1] ** 3)
+        if self.rdf_norm == 0:
+            return centers, np.zeros_like(centers)
+        return centers, self.rdf_counts / (self.rdf_norm * shells)
+
+    def overhead_fraction(self, step_seconds):
+        #Share of total step wall time spent sampling.
+        return self.sample_seconds / step_seconds if step_seconds > 0 else 0.0
+
+    def timing(self, step_seconds=None):
+        #Sampling cost summary; with the total step wall time it includes the overhead fraction.
+        report = {
+            "samples": self.samples,
+            "rdf_samples": self.rdf_samples,
+            "sample_seconds": self.sample_seconds,
+            "rdf_seconds": self.rdf_seconds,
+            "seconds_per_sample": self.sample_seconds / self.samples if self.samples else 0.0,
+        }
+        if step_seconds is not None:
+            report["overhead_fraction"] = self.overhead_fraction(step_seconds)
+        return report
+
+    def _stream(self, row):
+        if self._csv_writer is not None:
+            self._csv_writer.writerow(row)
+        elif self.stream_path is not None:
+            self._rows.append(row)
+
+    def close(self):
+        #Flush the stream; NPZ streams are written here along with the RDF and accumulator summaries.
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
+        elif self.stream_path is not None:
+            data = np.array(self._rows, dtype=np.float64).reshape(-1, len(self.FIELDS))
+            centers, rdf = self.rdf()
+            summary = {f"{field}_mean": stats.mean for field, stats in self.statistics.items()}
+            summary.update({f"{field}_std": stats.std for field, stats in self.statistics.items()})
+            summary.update(self.timing())
+            directory = os.path.dirname(self.stream_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            np.savez(self.stream_path, fields=np.array(self.FIELDS), samples=data, rdf_r=centers, rdf=rdf, **summary)
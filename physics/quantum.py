@@ -0,0 +1,92 @@
+import numpy as np
+
+#p-orbital axis for each magnetic quantum number, matching Electron.create_for_orbital
+P_ORBITAL_AXES = {
+    -1: np.array([1.0, 0.0, 0.0]),
+    0: np.array([0.0, 1.0, 0.0]),
+    1: np.array([0.0, 0.0, 1.0]),
+}
+
+def orbital_radius(n, settings):
+    #Simplified Bohr radius of shell n.
+    return n * n * settings.ORBITAL_SCALE_FACTOR
+
+def orbital_speed(n, settings):
+    #Nominal orbital speed of shell n.
+    return settings.ORBITAL_VELOCITY_FACTOR / np.sqrt(n)
+
+def orbital_frequency(n, settings):
+    #Angular frequency of the closed-form orbit for shell n.
+    return orbital_speed(n, settings) / orbital_radius(n, settings)
+
+def _template_orbit(electron, settings):
+    #Canonical orbit for the electron's (n, l, m) when its current state cannot be used.
+    n = electron.principal_quantum_number
+    radius = orbital_radius(n, settings)
+    omega = orbital_frequency(n, settings)
+    if electron.angular_momentum_quantum_number == 1:
+        axis = P_ORBITAL_AXES.get(electron.magnetic_quantum_number, P_ORBITAL_AXES[1])
+        perpendicular = np.roll(axis, 1)
+        #Elongated ellipse along the lobe axis
+        return axis * radius, perpendicular * (radius / 3) * omega
+
+    #s orbital: circle in a random plane
+    normal = np.random.normal(size=3)
+    normal /= np.linalg.norm(normal)
+    first = np.cross(normal, [1.0, 0.0, 0.0])
+    if np.linalg.norm(first) < 1e-6:
+        first = np.cross(normal, [0.0, 1.0, 0.0])
+    first /= np.linalg.norm(first)
+    second = np.cross(normal, first)
+    return first * radius, second * radius * omega
+
+def fit_orbits(electrons, nucleus_position, settings):
+    #Fit closed-form orbits to the electrons' current states.
+    #Each electron follows x(t) = x0 cos(wt) + (v0 / w) sin(wt) around the nucleus, with w set by n.
+    #This matches position and velocity exactly at t = 0, so switching modes is seamless; electrons
+    #whose state has run away from their shell fall back to the (n, l, m) template orbit.
+    count = len(electrons)
+    offsets = np.zeros((count, 3))
+    velocities = np.zeros((count, 3))
+    omega = np.zeros(count)
+    for index, electron in enumerate(electrons):
+        n = electron.principal_quantum_number
+        omega[index] = orbital_frequency(n, settings)
+        offset = electron.position - nucleus_position
+        velocity = electron.velocity
+        radius = orbital_radius(n, settings)
+        amplitude = np.sqrt(np.dot(offset, offset) + np.dot(velocity, velocity) / omega[index] ** 2)
+        if not np.isfinite(amplitude) or amplitude < 1e-3 * radius or amplitude > 4 * radius:
+            offset, velocity = _template_orbit(electron, settings)
+        offsets[index] = offset
+        velocities[index] = velocity
+    return {"offsets": offsets, "velocities": velocities, "omega": omega}
+
+def evaluate_orbits(orbits, elapsed):
+    #Offsets from the nucleus and velocities of fitted orbits `elapsed` seconds after the fit.
+    omega = orbits["omega"][:, None]
+    phase = omega * elapsed
+    cos, sin = np.cos(phase), np.sin(phase)
+    x0, v0 = orbits["offsets"], orbits["velocities"]
+    offsets = x0 * cos + (v0 / omega) * sin
+    velocities = v0 * cos - x0 * omega * sin
+    return offsets, velocities
+
+def assign_physics_lod(atoms, camera_position, settings, focus_atoms=()):
+    #Switch each atom between full force integration and analytic orbits.
+    #Focused (selected) atoms, bonded atoms and atoms near the camera are integrated fully;
+    #a 10% hysteresis band around PHYSICS_LOD_DISTANCE stops atoms flickering between modes.
+    if not atoms:
+        return
+    distance = getattr(settings, 'PHYSICS_LOD_DISTANCE', 15.0)
+    positions = np.array([atom.position for atom in atoms], dtype=np.float64)
+    distances = np.linalg.norm(positions - np.asarray(camera_position, dtype=np.float64), axis=1)
+    focus = set(id(atom) for atom in focus_atoms if atom is not None)
+
+    for atom, atom_distance in zip(atoms, distances):
+        if id(atom) in focus or atom.bonds:
+            atom.set_analytic_orbits(False)
+        elif atom.analytic_orbits:
+            atom.set_analytic_orbits(bool(atom_distance > distance))
+        else:
+            atom.set_analytic_orbits(bool(atom_distance > 1.1 * distance))
@@ -0,0 +1,289 @@
+import json
+import socket
+import struct
+import threading
+import zlib
+import numpy as np
+from physics.islands import bond_pairs
+
+#Frame layout (little endian):
+#  header  magic 'PSIM', frame type (0 keyframe, 1 delta), frame index, simulation time,
+#          particle count, quantization range
+#  events  u32 length + zlib(JSON list of bond/molecule events)
+#  payload u32 length + zlib(body)
+#Keyframe body: kinds (u8 per particle), atomic numbers (i16), positions (u16 x 3, byte planes split)
+#Delta body:    positions minus the last keyframe's, modulo 2^16 (byte planes split)
+#On a socket every frame is prefixed with its u32 length.
+MAGIC = b'PSIM'
+HEADER = struct.Struct('<4sBIdIf')
+LENGTH = struct.Struct('<I')
+KEYFRAME = 0
+DELTA = 1
+
+#Particle kinds in the stream
+KIND_NUCLEUS = 0
+KIND_ELECTRON = 1
+
+def gather_particles(atoms):
+    #Flat particle arrays for streaming: each atom centre followed by its electrons.
+    counts = [1 + len(atom.electrons) for atom in atoms]
+    total = sum(counts)
+    positions = np.empty((total, 3), dtype=np.float32)
+    kinds = np.full(total, KIND_ELECTRON, dtype=np.uint8)
+    numbers = np.zeros(total, dtype=np.int16)
+    index = 0
+    for atom, count in zip(atoms, counts):
+        positions[index] = atom.position
+        kinds[index] = KIND_NUCLEUS
+        numbers[index] = atom.atomic_number
+        for offset, electron in enumerate(atom.electrons, start=1):
+            positions[index + offset] = electron.position
+        index += count
+    return positions, kinds, numbers
+
+def _split_planes(values):
+    #Reorder 16-bit values as all low bytes then all high bytes, which compresses far better.
+    return np.ascontiguousarray(values.astype('<u2').view(np.uint8).reshape(-1, 2).T).tobytes()
+
+def _join_planes(data, count):
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(2, count)
+    return np.ascontiguousarray(planes.T).view('<u2').reshape(-1)
+
+class BondChangeTracker:
+    #Bond formation/breaking events between consecutive published frames (atom indices).
+
+    def __init__(self):
+        self._previous = set()
+
+    def events(self, atoms):
+        i, j = bond_pairs(atoms)
+        current = set(zip(i.tolist(), j.tolist()))
+        events = [{"type": "bond_formed", "atoms": list(pair)} for pair in sorted(current - self._previous)]
+        events += [{"type": "bond_broken", "atoms": list(pair)} for pair in sorted(self._previous - current)]
+        self._previous = current
+        return events
+
+class StateEncoder:
+    #Quantizes positions to 16 bits over [-quantization_range, quantization_range] and encodes
+    #deltas against the last keyframe, with a fresh keyframe every `keyframe_interval` frames or
+    #whenever the particle layout changes.  Reconstruction error is at most half a quantum
+    #(range / 65535) for particles inside the range; particles outside it are clamped.
+
+    def __init__(self, quantization_range, keyframe_interval=30, level=1):
+        self.quantization_range = float(quantization_range)
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.frame_index = 0
+        self.force_keyframe = True
+        self._key_quantized = None
+        self._key_layout = None
+        self._since_keyframe = 0
+
+    @property
+    def max_error(self):
+        return self.quantization_range / 65535.0
+
+    def quantize(self, positions):
+        scaled = (np.asarray(positions, dtype=np.float64) + self.quantization_range) / (2.0 * self.quantization_range)
+        return np.round(np.clip(scaled, 0.0, 1.0) * 65535.0).astype(np.uint16)
+
+    def encode(self, positions, kinds, atomic_numbers, sim_time, events=()):
+        #Encode one frame and return its bytes.
+        quantized = self.quantize(positions).reshape(-1)
+        layout = (kinds.tobytes(), atomic_numbers.astype('<i2').tobytes())
+        keyframe = (self.force_keyframe or layout != self._key_layout
+                    or self._since_keyframe >= self.keyframe_interval)
+
+        if keyframe:
+            body = layout[0] + layout[1] + _split_planes(quantized)
+            self._key_quantized = quantized
+            self._key_layout = layout
+            self._since_keyframe = 0
+            self.force_keyframe = False
+        else:
+            body = _split_planes(quantized - self._key_quantized)  #wraps modulo 2^16
+        self._since_keyframe += 1
+
+        header = HEADER.pack(MAGIC, KEYFRAME if keyframe else DELTA, self.frame_index, sim_time, len(kinds), self.quantization_range)
+        event_bytes = zlib.compress(json.dumps(list(events)).encode(), self.level)
+        payload = zlib.compress(body, self.level)
+        self.frame_index += 1
+        return b''.join((header, LENGTH.pack(len(event_bytes)), event_bytes, LENGTH.pack(len(payload)), payload))
+
+class StateDecoder:
+    #Rebuilds particle states from encoded frames.
+
+    def __init__(self):
+        self._key_quantized = None
+        self.kinds = None
+        self.atomic_numbers = None
+
+    def decode(self, frame):
+        #Decode one frame into a dict of frame index, time, positions, kinds, atomic numbers and events.
+        magic, frame_type, index, sim_time, count, quantization_range = HEADER.unpack_from(frame, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a state stream frame")
+        offset = HEADER.size
+        (event_length,) = LENGTH.unpack_from(frame, offset)
+        offset += LENGTH.size
+        events = json.loads(zlib.decompress(frame[offset:offset + event_length]))
+        offset += event_length
+        (payload_length,) = LENGTH.unpack_from(frame, offset)
+        offset += LENGTH.size
+        body = zlib.decompress(frame[offset:offset + payload_length])
+
+        if frame_type == KEYFRAME:
+            self.kinds = np.frombuffer(body[:count], dtype=np.uint8)
+            self.atomic_numbers = np.frombuffer(body[count:3 * count], dtype='<i2')
+            quantized = _join_planes(body[3 * count:], 3 * count)
+            self._key_quantized = quantized
+        else:
+            if self._key_quantized is None or len(self._key_quantized) != 3 * count:
+                raise ValueError("Delta frame received before its keyframe")
+            quantized = self._key_quantized + _join_planes(body, 3 * count)  #wraps modulo 2^16
+
+        positions = (quantized.astype(np.float64) / 65535.0 * 2.0 - 1.0) * quantization_range
+        return {
+            "frame": index,
+            "time": sim_time,
+            "keyframe": frame_type == KEYFRAME,
+            "positions": positions.reshape(-1, 3).astype(np.float32),
+            "kinds": self.kinds,
+            "atomic_numbers": self.atomic_numbers,
+            "events": events,
+        }
+
+class StatePublisher:
+    #Publishes encoded frames to viewers connected over a local TCP socket.
+    #Newly connected viewers trigger a keyframe; viewers that stop reading are dropped.
+
+    def __init__(self, settings, host='127.0.0.1', port=0, keyframe_interval=30):
+        quantization_range = getattr(settings, 'STREAM_RANGE', 2.0 * settings.SIMULATION_BOUNDS)
+        self.encoder = StateEncoder(quantization_range, keyframe_interval)
+        self.bonds = BondChangeTracker()
+        self.clients = []
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = socket.create_server((host, port))
+        self.address = self._server.getsockname()
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            client.settimeout(1.0)
+            with self._lock:
+                self.clients.append(client)
+                self.encoder.force_keyframe = True
+
+    def publish(self, atoms, sim_time, events=()):
+        #Encode the current state and send it to every connected viewer.
+        with self._lock:
+            if not self.clients:
+                return None
+            positions, kinds, numbers = gather_particles(atoms)
+            frame = self.encoder.encode(positions, kinds, numbers, sim_time, self.bonds.events(atoms) + list(events))
+            message = LENGTH.pack(len(frame)) + frame
+            for client in list(self.clients):
+                try:
+                    client.sendall(message)
+                    self.bytes_sent += len(message)
+                except OSError:
+                    self.clients.remove(client)
+                    client.close()
+            return frame
+
+    def close(self):
+        self._server.close()
+        with self._lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+
+class StateViewerClient:
+    #Minimal viewer that connects to a publisher and yields reconstructed states.
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.socket = socket.create_connection((host, port))
+        self.decoder = StateDecoder()
+
+    def _read_exactly(self, size):
+        chunks = []
+        while size:
+            chunk = self.socket.recv(size)
+            if not chunk:
+                raise ConnectionError("Publisher closed the stream")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def receive(self):
+        #Block for the next frame and return the decoded state.
+        (length,) = LENGTH.unpack(self._read_exactly(LENGTH.size))
+        return self.decoder.decode(self._read_exactly(length))
+
+    def frames(self):
+        while True:
+            try:
+                yield self.receive()
+            except ConnectionError:
+                return
+
+    def close(self):
+        self.socket.close()
+
+def validate_loopback(frames=90, particles=1000, quantization_range=10.0, keyframe_interval=30, seed=0):
+    #Stream a random walk through a real loopback socket and compare what the viewer reconstructs.
+    #Halfway through particles are added, so both interval and layout-change keyframes are covered.
+    #Returns (max reconstruction error, allowed error, keyframes received); the allowed error is
+    #StateEncoder.max_error plus one float32 rounding step, since decoded positions are float32.
+    rng = np.random.default_rng(seed)
+    encoder = StateEncoder(quantization_range, keyframe_interval)
+    limit = 0.9 * quantization_range
+    positions = rng.uniform(-limit, limit, (particles, 3))
+    server = socket.create_server(('127.0.0.1', 0))
+    viewer = StateViewerClient(*server.getsockname())
+    connection, _ = server.accept()
+    worst = 0.0
+    keyframes = 0
+    try:
+        for index in range(frames):
+            if index == frames // 2:
+                positions = np.concatenate([positions, rng.uniform(-limit, limit, (10, 3))])
+            positions = np.clip(positions + rng.normal(0.0, 0.01 * quantization_range, positions.shape), -limit, limit)
+            sent = positions.astype(np.float32)
+            kinds = np.zeros(len(sent), dtype=np.uint8)
+            numbers = np.ones(len(sent), dtype=np.int16)
+            frame = encoder.encode(sent, kinds, numbers, index * 0.01)
+            connection.sendall(LENGTH.pack(len(frame)) + frame)
+            state = viewer.receive()
+            worst = max(worst, float(np.max(np.abs(state["positions"].astype(np.float64) - sent))))
+            keyframes += state["keyframe"]
+    finally:
+        viewer.close()
+        connection.close()
+        server.close()
+    return worst, encoder.max_error + np.finfo(np.float32).eps * quantization_range, keyframes
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Print frames from a running simulation's state stream")
+    parser.add_argument('address', nargs='?', help="host:port of the publisher")
+    parser.add_argument('--validate', action='store_true', help="run the loopback reconstruction check instead")
+    arguments = parser.parse_args()
+    if arguments.validate:
+        error, bound, keyframes = validate_loopback()
+        passed = error <= bound
+        print(f"max error {error:.3e} (bound {bound:.3e}), {keyframes} keyframes: {'ok' if passed else 'FAILED'}")
+        raise SystemExit(0 if passed else 1)
+    if arguments.address is None:
+        parser.error("address is required unless --validate is given")
+    host, port = arguments.address.rsplit(':', 1)
+    viewer = StateViewerClient(host, int(port))
+    for state in viewer.frames():
+        kind = "key" if state["keyframe"] else "delta"
+        print(f"frame {state['frame']} ({kind}) t={state['time']:.3f} particles={len(state['positions'])} events={len(state['events'])}")
@@ -0,0 +1,101 @@
+import numpy as np
+
+def box_lengths(settings):
+    #Edge lengths of the periodic simulation box.
+    #The box spans [-SIMULATION_BOUNDS, SIMULATION_BOUNDS] on every axis.
+    side = 2.0 * settings.SIMULATION_BOUNDS
+    return np.array([side, side, side], dtype=np.float64)
+
+def is_periodic(settings):
+    #True when the optional periodic box is enabled.
+    return bool(getattr(settings, 'PERIODIC_BOUNDARIES', False))
+
+def minimum_image(delta, box):
+    #Map displacement vectors onto their nearest periodic image.
+    #delta can be a single vector or an (N, 3) array; box is the edge length per axis.
+    box = np.asarray(box, dtype=np.float64)
+    return delta - box * np.round(delta / box)
+
+def wrap_positions(positions, box):
+    #Wrap positions back into the box centred on the origin.
+    box = np.asarray(box, dtype=np.float64)
+    return positions - box * np.floor(positions / box + 0.5)
+
+def _cell_neighbor_offsets():
+    #The 27 integer offsets of a cell and its neighbours.
+    span = np.arange(-1, 2)
+    return np.stack(np.meshgrid(span, span, span, indexing='ij'), axis=-1).reshape(-1, 3)
+
+def pairs_within(positions, distance, box=None):
+    #All index pairs (i, j), i < j, closer than `distance`, found with a vectorized cell grid.
+    #With `box` given, distances use the minimum image convention.
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    count = len(positions)
+    empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    if count < 2 or distance <= 0:
+        return empty
+
+    if box is not None:
+        box = np.asarray(box, dtype=np.float64)
+        cells = np.maximum(np.floor(box / distance).astype(np.int64), 1)
+        if np.any(cells < 3):
+            #Too few cells to avoid double counting images; fall back to all pairs
+            i, j = np.triu_indices(count, k=1)
+            delta = minimum_image(positions[i] - positions[j], box)
+            keep = np.einsum('ij,ij->i', delta, delta) < distance * distance
+            return i[keep], j[keep]
+        origin = -0.5 * box
+        size = box / cells
+        coords = np.floor((wrap_positions(positions, box) - origin) / size).astype(np.int64) % cells
+    else:
+        origin = positions.min(axis=0)
+        extent = positions.max(axis=0) - origin
+        cells = np.maximum(np.floor(extent / distance).astype(np.int64), 1)
+        #Keep the dense cell table bounded for very sparse scenes
+        while np.prod(cells) > 4 * count + 64:
+            cells = np.maximum(cells // 2, 1)
+        size = np.where(extent > 0, extent / cells, 1.0)
+        size = np.maximum(size, distance)
+        coords = np.minimum(np.floor((positions - origin) / size).astype(np.int64), cells - 1)
+
+    cell_ids = (coords[:, 0] * cells[1] + coords[:, 1]) * cells[2] + coords[:, 2]
+    order = np.argsort(cell_ids, kind='stable')
+    total_cells = int(np.prod(cells))
+    cell_count = np.bincount(cell_ids, minlength=total_cells)
+    cell_start = np.concatenate(([0], np.cumsum(cell_count)[:-1]))
+
+    first, second = [], []
+    for offset in _cell_neighbor_offsets():
+        neighbor = coords + offset
+        if box is not None:
+            neighbor %= cells
+            valid = np.ones(count, dtype=bool)
+        else:
+            valid = np.all((neighbor >= 0) & (neighbor < cells), axis=1)
+        atoms = np.nonzero(valid)[0]
+        neighbor = neighbor[valid]
+        neighbor_ids = (neighbor[:, 0] * cells[1] + neighbor[:, 1]) * cells[2] + neighbor[:, 2]
+        counts = cell_count[neighbor_ids]
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        i = np.repeat(atoms, counts)
+        local = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(cell_start[neighbor_ids], counts) + local]
+        keep = i < j
+        first.append(i[keep])
+        second.append(j[keep])
+
+    if not first:
+        return empty
+    i = np.concatenate(first)
+    j = np.concatenate(second)
+    delta = positions[i] - positions[j]
+    if box is not None:
+        delta = minimum_image(delta, box)
+    keep = np.einsum('ij,ij->i', delta, delta) < distance * distance
+    return i[keep], j[keep]
+
+def boltzmann_constant(settings):
+    #Boltzmann constant in simulation units (energy per kelvin, with masses in atomic mass units).
+    return getattr(settings, 'REDUCED_BOLTZMANN_CONSTANT', 1e-3)
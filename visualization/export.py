@@ -0,0 +1,174 @@
+import ctypes
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+#OpenGL is imported inside the methods that need a current context, so frames can also be fed
+#to the exporter (and PNGs encoded) without a GL stack, e.g. from tests or offline tools.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+def encode_png(pixels, level=6):
+    #PNG bytes for an (height, width, 3) or (height, width, 4) uint8 image, top row first.
+    height, width, channels = pixels.shape
+    color_type = {3: 2, 4: 6}[channels]
+    rows = np.empty((height, 1 + width * channels), dtype=np.uint8)
+    rows[:, 0] = 0  #filter type None; zlib does the work
+    rows[:, 1:] = pixels.reshape(height, -1)
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    return b''.join((
+        PNG_SIGNATURE,
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(rows.tobytes(), level)),
+        _png_chunk(b'IEND', b''),
+    ))
+
+def write_png(path, pixels, level=6):
+    with open(path, 'wb') as handle:
+        handle.write(encode_png(pixels, level))
+
+def create_offscreen_context(width, height):
+    #Current OSMesa (software Mesa) context for headless export; returns (context, color buffer).
+    #PYOPENGL_PLATFORM must be 'osmesa' before OpenGL is first imported, so this is set here when
+    #nothing has imported OpenGL yet; otherwise the caller has to set it at startup.
+    os.environ.setdefault('PYOPENGL_PLATFORM', 'osmesa')
+    from OpenGL import GL, arrays, osmesa
+    context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+    if not context:
+        raise RuntimeError("Could not create an OSMesa context")
+    buffer = arrays.GLubyteArray.zeros((height, width, 4))
+    if not osmesa.OSMesaMakeCurrent(context, buffer, GL.GL_UNSIGNED_BYTE, width, height):
+        raise RuntimeError("Could not make the OSMesa context current")
+    return context, buffer
+
+class FrameExporter:
+    #Writes rendered frames as numbered PNGs without stalling the render loop.
+    #capture() starts an asynchronous glReadPixels into one of two pixel pack buffers and maps the
+    #other one, which holds the previous frame and has finished transferring by now, so the CPU
+    #never waits on the GPU.  Mapped pixels are copied out and encoded/written by a thread pool.
+    #Without PBO support it falls back to a synchronous glReadPixels (encoding stays off-thread).
+    #At most `max_pending` frames are queued; beyond that capture() waits for the oldest write.
+
+    def __init__(self, directory, width, height, prefix='frame', workers=2, level=6, use_pbo=True, max_pending=8):
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.prefix = prefix
+        self.level = level
+        self.use_pbo = use_pbo
+        self.max_pending = max_pending
+        self.frame_count = 0
+        self.frames_written = 0
+        os.makedirs(directory, exist_ok=True)
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='frame-export')
+        self._pending = deque()
+        self._buffers = None
+        self._buffer_index = 0
+        self._in_flight = [False, False]
+
+    @property
+    def frame_size(self):
+        return self.width * self.height * 3
+
+    def frame_path(self, index):
+        return os.path.join(self.directory, f"{self.prefix}_{index:06d}.png")
+
+    def submit(self, pixels, flip=True):
+        #Queue an (height, width, 3) uint8 frame for encoding; GL rows are bottom-up, hence `flip`.
+        while len(self._pending) >= self.max_pending:
+            self._pending.popleft().result()
+            self.frames_written += 1
+        path = self.frame_path(self.frame_count)
+        self.frame_count += 1
+        self._pending.append(self._pool.submit(write_png, path, pixels[::-1] if flip else pixels, self.level))
+        return path
+
+    def _create_buffers(self):
+        from OpenGL.GL import glGenBuffers, glBindBuffer, glBufferData, GL_PIXEL_PACK_BUFFER, GL_STREAM_READ
+        try:
+            buffers = glGenBuffers(2)
+        except Exception:
+            self.use_pbo = False  #no buffer objects in this context
+            return
+        for buffer in buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.frame_size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self._buffers = list(buffers)
+        self._in_flight = [False, False]
+
+    def _collect(self, index):
+        #Copy the finished transfer in PBO `index` out of GL memory and queue it.
+        from OpenGL.GL import glBindBuffer, glMapBuffer, glUnmapBuffer, GL_PIXEL_PACK_BUFFER, GL_READ_ONLY
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._buffers[index])
+        address = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        if address:
+            data = (ctypes.c_ubyte * self.frame_size).from_address(address)
+            pixels = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3).copy()
+            glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+            self.submit(pixels)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self._in_flight[index] = False
+
+    def capture(self):
+        #Read back the frame just rendered (call before swapping buffers).
+        from OpenGL.GL import (glBindBuffer, glPixelStorei, glReadPixels, GL_PACK_ALIGNMENT,
+                               GL_PIXEL_PACK_BUFFER, GL_RGB, GL_UNSIGNED_BYTE)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        if self.use_pbo and self._buffers is None:
+            self._create_buffers()
+        if not self.use_pbo:
+            data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+            self.submit(np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3).copy())
+            return
+
+        index = self._buffer_index
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._buffers[index])
+        glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self._in_flight[index] = True
+
+        other = 1 - index
+        if self._in_flight[other]:
+            self._collect(other)
+        self._buffer_index = other
+
+    def resize(self, width, height):
+        #Change the capture size; frames already in flight are written at the old size first.
+        if (width, height) == (self.width, self.height):
+            return
+        self._drain_buffers()
+        self._delete_buffers()
+        self.width, self.height = width, height
+
+    def _drain_buffers(self):
+        if self._buffers is None:
+            return
+        #Oldest first: the buffer not written most recently
+        for index in (self._buffer_index, 1 - self._buffer_index):
+            if self._in_flight[index]:
+                self._collect(index)
+
+    def _delete_buffers(self):
+        if self._buffers is not None:
+            from OpenGL.GL import glDeleteBuffers
+            glDeleteBuffers(2, self._buffers)
+            self._buffers = None
+
+    def finish(self):
+        #Collect outstanding readbacks, wait for every write and release GL buffers and threads.
+        #Must be called while the GL context is still current.  Returns the number of frames written.
+        self._drain_buffers()
+        self._delete_buffers()
+        while self._pending:
+            self._pending.popleft().result()
+            self.frames_written += 1
+        self._pool.shutdown()
+        return self.frames_written